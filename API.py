@@ -1,12 +1,20 @@
+import asyncio
 import subprocess
+import csv, io, json, re, time
+from contextlib import asynccontextmanager
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
+from psycopg import sql
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
 from typing import List, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from scheduler import run_spider, dump_db
-from fastapi.responses import  Response
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends
+from scheduler import run_spider, dump_db, queue_rechecks, RECHECK_TIME
+from car_stats import StatsCache, refresh_loop
+from car_search import SearchFilters, build_search_query
+from scraper_autoria.migrations import apply_migrations
+from fastapi.responses import  Response, StreamingResponse
 import uvicorn, os, sys
 from dotenv import load_dotenv
 from pathlib import Path
@@ -20,9 +28,53 @@ load_dotenv()
 # --- Глобальні змінні ---
 spider_process = None
 scheduler = None
-app = FastAPI()
-def get_db_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"))
+db_pool: AsyncConnectionPool | None = None
+stats_cache: StatsCache | None = None
+
+def _migrate():
+    with psycopg.connect(os.getenv("DATABASE_URL")) as conn:
+        apply_migrations(conn)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Один пул з'єднань на весь сервіс замість psycopg2.connect() на кожен запит."""
+    global db_pool, stats_cache
+    await asyncio.to_thread(_migrate)
+    db_pool = AsyncConnectionPool(
+        os.getenv("DATABASE_URL"),
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+        open=False,
+    )
+    await db_pool.open()
+    stats_cache = StatsCache(db_pool)
+    stats_refresher = asyncio.create_task(refresh_loop(db_pool, stats_cache))
+    try:
+        yield
+    finally:
+        stats_refresher.cancel()
+        await db_pool.close()
+
+app = FastAPI(lifespan=lifespan)
+
+ITEM_COLUMNS = ("id", "listing_id", "url", "title", "price_usd", "odometer", "username", "phone_number",
+                "image_url", "image_count", "car_number", "car_vin", "datetime_found", "datetime_updated",
+                "last_seen", "removed_at")
+MAX_PAGE_SIZE = 1000      # більше — через /items/export
+EXPORT_CHUNK_SIZE = 1000  # рядків на один fetch server-side курсора
+
+def _parse_fields(fields: str | None):
+    """`fields=title,price_usd` -> колонки для SELECT; id додається завжди (це курсор)."""
+    if not fields:
+        return ITEM_COLUMNS
+    columns = tuple(dict.fromkeys(["id"] + [f.strip() for f in fields.split(",") if f.strip()]))
+    unknown = set(columns) - set(ITEM_COLUMNS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return columns
+
+def _select_columns(columns):
+    return sql.SQL(", ").join(map(sql.Identifier, columns))
 
 def start_scheduler():
     global scheduler
@@ -35,41 +87,123 @@ def start_scheduler():
     d_hour, d_minute = DUMP_TIME.split(":")
     scheduler.add_job(run_spider,'cron', hour=int(s_hour),minute=int(s_minute))
     scheduler.add_job(dump_db,'cron',hour=int(d_hour),minute=int(d_minute))
+    r_hour, r_minute = RECHECK_TIME.split(":")
+    scheduler.add_job(queue_rechecks,'cron',hour=int(r_hour),minute=int(r_minute))
     scheduler.start()
     return "Scheduler started"
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Cars API"}
 @app.get("/stats")
-def get_stats():
-    cur = get_db_connection().cursor()
-    cur.execute("SELECT COUNT(url) FROM car_products")
-    cur.close()
-    return {"Number of products in DB":cur.fetchall()}
+async def get_stats(days: int = Query(30, ge=1, le=3650)):
+    """
+    Cached aggregates: total count, new listings per day (last `days` days),
+    phone extraction ratio, price/odometer percentiles. Never scans car_products.
+    """
+    return await stats_cache.get(days)
+
+@app.get("/health/db")
+async def db_health():
+    """Pool usage (psycopg_pool stats) and a round trip to PostgreSQL."""
+    try:
+        async with db_pool.connection(timeout=5) as conn:
+            await conn.execute("SELECT 1")
+        status = "ok"
+    except Exception as e:
+        status = f"error: {e}"
+    return {"status": status, "pool": db_pool.get_stats()}
 
 @app.get("/items/", response_model=List[dict])
-def get_last_items(last: int = 10, first: int | None = None):
-    """Get last N items from the database"""
+async def get_last_items(response: Response,
+                   last: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                   first: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                   before_id: int | None = None,
+                   after_id: int | None = None,
+                   fields: str | None = None):
+    """
+    Get last N items (or first N) from the database.
+    Keyset pagination: the X-Next-Cursor header is the id to pass back as
+    `before_id` (newest first, `last`) or `after_id` (oldest first, `first`).
+    `fields=title,price_usd` limits the returned columns.
+    """
+    columns = _parse_fields(fields)
+    ascending = first is not None or after_id is not None
+    limit = (first or last) if ascending else last
+    where, params = sql.SQL(""), []
+    if ascending:
+        where, params = sql.SQL("WHERE id > %s"), [after_id or 0]
+    elif before_id is not None:
+        where, params = sql.SQL("WHERE id < %s"), [before_id]
+    query = sql.SQL("SELECT {columns} FROM car_listings {where} ORDER BY id {order} LIMIT %s").format(
+        columns=_select_columns(columns), where=where, order=sql.SQL("ASC" if ascending else "DESC"))
+    try:
+        async with db_pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(query, (*params, limit))
+                rows = await cur.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+@app.get("/cars/search", response_model=List[dict])
+async def search_cars(response: Response,
+                      filters: SearchFilters = Depends(),
+                      limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                      before_id: int | None = None,
+                      fields: str | None = None):
+    """
+    Search by price/odometer range, title substring, brand, VIN, plate and date found.
+    Newest first; pass X-Next-Cursor back as `before_id` for the next page.
+    """
+    columns = _parse_fields(fields)
+    query, params = build_search_query(filters, columns, limit, before_id)
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                if last and first is None:
-                    cur.execute("""
-                        SELECT * 
-                        FROM car_products 
-                        ORDER BY id DESC 
-                            LIMIT %s
-                    """, (last,))
-                elif first is not None:
-                    cur.execute("""
-                                SELECT *
-                                FROM car_products
-                                ORDER BY id ASC
-                                    LIMIT %s
-                                """, (first,))
-                return cur.fetchall()
+        async with db_pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(query, params)
+                rows = await cur.fetchall()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+@app.get("/items/export")
+async def export_items(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                 fields: str | None = None,
+                 after_id: int = 0):
+    """
+    Streams the whole table (ordered by id) as NDJSON or CSV at constant memory:
+    rows come from a server-side cursor in chunks of EXPORT_CHUNK_SIZE.
+    `after_id` resumes an interrupted export.
+    """
+    columns = _parse_fields(fields)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(_stream_items(columns, after_id, format), media_type=media_type)
+
+async def _stream_items(columns, after_id, fmt):
+    # З'єднання з пулу тримається, поки клієнт читає потік
+    async with db_pool.connection() as conn:
+        # Іменований курсор — server-side, у пам'яті лише поточний chunk
+        async with conn.cursor(name="items_export") as cur:
+            await cur.execute(sql.SQL("SELECT {columns} FROM car_listings WHERE id > %s ORDER BY id").format(
+                columns=_select_columns(columns)), (after_id,))
+            if fmt == "csv":
+                yield _csv_lines([columns])
+            while rows := await cur.fetchmany(EXPORT_CHUNK_SIZE):
+                if fmt == "csv":
+                    yield _csv_lines([[json.dumps(v) if isinstance(v, list) else v for v in row] for row in rows])
+                else:
+                    yield "".join(json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n"
+                                  for row in rows)
+
+def _csv_lines(rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
 @app.get("/start")
 def start_scheduler_endpoint():
     """Start the scheduler"""
@@ -95,17 +229,22 @@ async def get_status():
         }
     return {"status":"stopped"}
 
-def _run_spider_process():
+def _run_spider_process(full_sweep=False):
     global spider_process
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     log_file = f"logs/spider_{timestamp}.log"
     cmd = [sys.executable, '-m', 'scrapy', 'crawl', 'autoria',
            '-s', 'LOG_LEVEL=INFO', '-s', f'LOG_FILE={log_file}']
+    if full_sweep:
+        cmd += ['-s', 'CRAWL_FULL_SWEEP=true']
     spider_process = subprocess.Popen(cmd)
 
 @app.get("/spider/run")
-async def start_spider(background_tasks: BackgroundTasks):
-    """Run spider immediately"""
+async def start_spider(background_tasks: BackgroundTasks, full_sweep: bool = False):
+    """
+    Run spider immediately. By default the crawl is incremental and stops after
+    INCREMENTAL_STOP_PAGES results pages without new listings; `full_sweep` walks all pages.
+    """
     global spider_process
     # Перевіряємо, чи він вже не запущений
     if spider_process is not None:
@@ -115,7 +254,7 @@ async def start_spider(background_tasks: BackgroundTasks):
             # Процес завершився (успішно або з помилкою), треба "обнулити" його
             spider_process = None
     # Запускаємо через BackgroundTasks, щоб не вішати API
-    background_tasks.add_task(_run_spider_process)
+    background_tasks.add_task(_run_spider_process, full_sweep)
     return {"status": "success", "message": "Spider started in background"}
 
 @app.get("/spider/stop")
@@ -145,18 +284,98 @@ def get_logs():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+# Рівень у JSON-рядку ("level": "INFO") або в текстовому форматі Scrapy ("[logger] INFO: ...")
+LOG_LEVEL_RE = re.compile(rb'(?:"level":\s*"|\] )(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b')
+LOG_CHUNK_SIZE = 64 * 1024
+
 @app.get("/logs/{log_file}")
-async def read_log(log_file: str):
-    """Reads specified log file in web"""
-    log_path = f"logs/{log_file}"
+async def read_log(log_file: str,
+                   tail: int | None = Query(None, ge=1, description="last N lines"),
+                   offset: int = Query(0, ge=0, description="start at this byte (X-Log-Size of a previous read)"),
+                   limit: int | None = Query(None, ge=1, description="stop after N matching lines"),
+                   level: str | None = Query(None, pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$"),
+                   url: str | None = None,
+                   follow: int = Query(0, ge=0, le=3600, description="keep streaming new lines for N seconds")):
+    """
+    Streams a log file at constant memory, filtered on the server:
+    `level` is the minimum level, `url` a substring (e.g. a car URL in LOG_JSON records).
+    Lines without a level (tracebacks) follow the record they belong to.
+    X-Log-Size is the file size at request time — pass it as `offset` to read only new lines.
+    """
+    if Path(log_file).name != log_file:
+        raise HTTPException(status_code=400, detail="Invalid log file name")
+    log_path = logs_dir / log_file
     try:
-        async with aiofiles.open(log_path, mode="r", encoding="utf-8") as f:
-            content = await f.read()
-            return Response(content=content, media_type="text/plain")
+        size = log_path.stat().st_size
+        start = min(offset, size)
+        if tail:
+            async with aiofiles.open(log_path, mode="rb") as f:
+                start = await _tail_offset(f, size, tail)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Log file not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
+    return StreamingResponse(_stream_log(log_path, start, limit, _line_filter(level, url), follow),
+                             media_type="text/plain; charset=utf-8", headers={"X-Log-Size": str(size)})
+
+async def _tail_offset(f, size, lines):
+    """Байтовий зсув початку останніх `lines` рядків: файл читається блоками з кінця."""
+    position = size
+    while position > 0:
+        step = min(LOG_CHUNK_SIZE, position)
+        position -= step
+        await f.seek(position)
+        chunk = await f.read(step)
+        index = len(chunk)
+        while (index := chunk.rfind(b"\n", 0, index)) != -1:
+            if position + index == size - 1:
+                continue  # \n, яким закінчується останній рядок
+            lines -= 1
+            if lines == 0:
+                return position + index + 1
+    return 0
+
+def _line_filter(level, url):
+    min_level = LOG_LEVELS.index(level) if level else 0
+    url = url.encode() if url else None
+    keep = True
+
+    def check(line):
+        nonlocal keep
+        match = LOG_LEVEL_RE.search(line)
+        if match:
+            keep = LOG_LEVELS.index(match.group(1).decode()) >= min_level and (url is None or url in line)
+        return keep
+    return check
+
+async def _stream_log(log_path, start, limit, keep, follow):
+    sent = 0
+    pending = b""  # неповний рядок на межі блоку (або той, що ще дописується)
+    deadline = time.monotonic() + follow
+    async with aiofiles.open(log_path, mode="rb") as f:
+        await f.seek(start)
+        while True:
+            chunk = await f.read(LOG_CHUNK_SIZE)
+            if chunk:
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                matched = [line + b"\n" for line in lines if keep(line)]
+                if limit:
+                    matched = matched[:limit - sent]
+                sent += len(matched)
+                if matched:
+                    yield b"".join(matched)
+                if limit and sent >= limit:
+                    return
+                continue
+            # Кінець файлу: чекаємо нових рядків до deadline; файл став меншим — його ротовано
+            if time.monotonic() >= deadline or log_path.stat().st_size < await f.tell():
+                break
+            await asyncio.sleep(1)
+    if pending and keep(pending):
+        yield pending
+
 @app.get("/dump")
 def dump():
     dump_db()
@@ -0,0 +1,131 @@
+"""
+Мікро-бенчмарк очищувачів полів зі scraper_autoria/loaders.py.
+Порівнює старі реалізації (`import re` і компіляція патерну на кожен виклик),
+нові з модульними патернами і batch-варіанти. Результат — нс на одне значення.
+
+    python benchmarks/cleaners.py --values 20000 --repeat 5
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scraper_autoria import loaders as l  # noqa: E402
+
+
+# --- Старі реалізації (до модульних патернів), для порівняння -------------
+def legacy_clean_price(value):
+    if not value:
+        return None
+    s = str(value).replace('$', '').replace('грн', '').strip()
+    import re
+    digits = re.sub(r'[^\d]', '', s)
+    return int(digits) if digits else None
+
+
+def legacy_clean_odometer(value):
+    if not value:
+        return None
+    import re
+    numbers = re.findall(r'\d+', str(value))
+    if numbers:
+        return int(numbers[0]) * 1000
+    return None
+
+
+def legacy_clean_image_count(value):
+    if not value:
+        return None
+    import re
+    numbers = re.findall(r'\d+', str(value))
+    if len(numbers) >= 2:
+        return int(numbers[1])
+    elif len(numbers) == 1:
+        return int(numbers[0])
+    return None
+
+
+def legacy_format_phone_number(phone):
+    if not phone:
+        return None
+    import re
+    digits = re.sub(r'\D', '', str(phone))
+    if digits.startswith('0'):
+        return int('38' + digits)
+    elif digits.startswith('380'):
+        return int(digits)
+    elif len(digits) < 9:
+        return int('380' + digits[-9:])
+    return int(digits)
+
+
+def legacy_clean_phone_list(value):
+    if not value:
+        return None
+    valid_phones = []
+    for phone in value:
+        if phone and isinstance(phone, str):
+            phone = phone.strip()
+            if phone and phone not in ['Phone not available', 'Phone not found', 'Not available']:
+                import re
+                if re.search(r'\d', phone):
+                    valid_phones.append(legacy_format_phone_number(phone))
+    return valid_phones
+
+
+# --- Сирі значення, схожі на те, що віддає сторінка ------------------------
+def sample_values(n, seed=42):
+    rnd = random.Random(seed)
+    return {
+        "price": [rnd.choice([f"{rnd.randint(1, 150):,} {rnd.randint(0, 999):03d} $".replace(",", " "),
+                              f"{rnd.randint(100, 9000)} {rnd.randint(0, 999):03d} грн", ""])
+                  for _ in range(n)],
+        "odometer": [rnd.choice([f"{rnd.randint(1, 400)} тис. км", "без пробігу", None]) for _ in range(n)],
+        "image_count": [f"1 з {rnd.randint(1, 40)}" for _ in range(n)],
+        "phone": [rnd.choice([f"(0{rnd.randint(50, 99)}) {rnd.randint(100, 999)} {rnd.randint(10, 99)} "
+                              f"{rnd.randint(10, 99)}", "Phone not found"]) for _ in range(n)],
+    }
+
+
+def per_value_ns(func, values, repeat):
+    best = min(timeit.repeat(lambda: func(values), number=1, repeat=repeat))
+    return best / len(values) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    data = sample_values(args.values)
+
+    cases = [
+        ("clean_price", data["price"], legacy_clean_price, l.clean_price, l.clean_prices),
+        ("clean_odometer", data["odometer"], legacy_clean_odometer, l.clean_odometer, l.clean_odometers),
+        ("clean_image_count", data["image_count"], legacy_clean_image_count, l.clean_image_count,
+         l.clean_image_counts),
+        ("format_phone_number", data["phone"], legacy_format_phone_number, l.format_phone_number,
+         l.format_phone_numbers),
+        ("clean_phone_list", data["phone"], legacy_clean_phone_list, l.clean_phone_list, None),
+    ]
+
+    print(f"{'cleaner':<22} {'legacy ns':>10} {'new ns':>10} {'batch ns':>10} {'speedup':>8}")
+    for name, values, legacy, new, batch in cases:
+        if name == "clean_phone_list":
+            # приймає список телефонів — міряємо одним викликом на весь список
+            legacy_ns = per_value_ns(legacy, values, args.repeat)
+            new_ns = per_value_ns(new, values, args.repeat)
+            batch_ns = None
+        else:
+            legacy_ns = per_value_ns(lambda vs: [legacy(v) for v in vs], values, args.repeat)
+            new_ns = per_value_ns(lambda vs: [new(v) for v in vs], values, args.repeat)
+            batch_ns = per_value_ns(batch, values, args.repeat)
+        best = min(new_ns, batch_ns or new_ns)
+        print(f"{name:<22} {legacy_ns:>10.0f} {new_ns:>10.0f} "
+              f"{batch_ns if batch_ns is not None else float('nan'):>10.0f} {legacy_ns / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
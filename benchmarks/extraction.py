@@ -0,0 +1,141 @@
+"""
+Перевірка і бенчмарк швидкого шляху витягування картки (scraper_autoria/extraction.py).
+1. На кожній HTML-фікстурі з benchmarks/fixtures/car_pages порівнює CarListing
+   з результатом ItemLoader-шляху (AutoriaSpider._load_item) поле в поле.
+2. Міряє CPU на одну картку і піковий обсяг алокацій (tracemalloc) для обох шляхів.
+3. --browser: відкриває фікстури у Firefox (Playwright) і порівнює page.content() + XPath
+   з одним page.evaluate (CAR_EXTRACTION_MODE = "js"): обсяг через міст, час, CPU Python-процесу.
+
+    python benchmarks/extraction.py --repeat 200
+    python benchmarks/extraction.py --browser
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from itemadapter import ItemAdapter  # noqa: E402
+
+from scraper_autoria.extraction import (  # noqa: E402
+    EXTRACT_JS, JS_FIELDS, CarListing, extract_listing, listing_from_fields,
+)
+from scraper_autoria.spiders.autoria import AutoriaSpider  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "car_pages"
+FIELDS = [f.name for f in dataclasses.fields(CarListing)]
+
+
+def load_fixtures():
+    phones = json.loads((FIXTURES / "phones.json").read_text(encoding="utf-8"))
+    return [
+        (f"https://auto.ria.com/uk/{path.name}", path.read_text(encoding="utf-8"), phones.get(path.name))
+        for path in sorted(FIXTURES.glob("*.html"))
+    ]
+
+
+def loader_path(html, url, phone):
+    return AutoriaSpider._load_item(html, url, phone)
+
+
+def as_fields(item):
+    adapter = ItemAdapter(item)
+    return {field: adapter.get(field) for field in FIELDS}
+
+
+def verify(fixtures):
+    mismatches = 0
+    for url, html, phone in fixtures:
+        expected = as_fields(loader_path(html, url, phone))
+        actual = as_fields(extract_listing(html, url, phone))
+        for field in FIELDS:
+            if expected[field] != actual[field]:
+                mismatches += 1
+                print(f"❌ {url.rsplit('/', 1)[-1]} {field}: loader={expected[field]!r} fast={actual[field]!r}")
+    print(f"{'✅' if not mismatches else '❌'} {len(fixtures)} fixtures, {mismatches} mismatched fields\n")
+    return mismatches
+
+
+def measure(func, fixtures, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        for url, html, phone in fixtures:
+            func(html, url, phone)
+    cpu_us = (time.process_time() - started) / (repeat * len(fixtures)) * 1e6
+
+    tracemalloc.start()
+    peak = 0
+    for url, html, phone in fixtures:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(html, url, phone)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return cpu_us, peak
+
+
+async def browser_compare(fixtures, repeat):
+    from playwright.async_api import async_playwright
+
+    totals = {"content": [0, 0.0, 0.0], "js": [0, 0.0, 0.0]}  # байти, секунди, CPU-секунди
+    mismatches = 0
+    async with async_playwright() as p:
+        browser = await p.firefox.launch(headless=True)
+        page = await browser.new_page()
+        for url, html, phone in fixtures:
+            await page.set_content(html)
+            expected = as_fields(loader_path(html, url, phone))
+            for _ in range(repeat):
+                wall, cpu = time.perf_counter(), time.process_time()
+                content = await page.content()
+                extract_listing(content, url, phone)
+                stat = totals["content"]
+                stat[0] += len(content.encode("utf-8"))
+                stat[1] += time.perf_counter() - wall
+                stat[2] += time.process_time() - cpu
+
+                wall, cpu = time.perf_counter(), time.process_time()
+                fields = await page.evaluate(EXTRACT_JS, JS_FIELDS)
+                listing = listing_from_fields(url, fields, phone)
+                stat = totals["js"]
+                stat[0] += len(json.dumps(fields, ensure_ascii=False).encode("utf-8"))
+                stat[1] += time.perf_counter() - wall
+                stat[2] += time.process_time() - cpu
+            for field, value in as_fields(listing).items():
+                if expected[field] != value:
+                    mismatches += 1
+                    print(f"❌ js {url.rsplit('/', 1)[-1]} {field}: loader={expected[field]!r} js={value!r}")
+        await browser.close()
+
+    items = repeat * len(fixtures)
+    print(f"\n{'bridge':<8} {'KB/item':>9} {'ms/item':>9} {'py cpu µs/item':>15}")
+    for name, (size, wall, cpu) in totals.items():
+        print(f"{name:<8} {size / items / 1024:>9.1f} {wall / items * 1e3:>9.2f} {cpu / items * 1e6:>15.1f}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--browser", action="store_true", help="also compare page.content() with page.evaluate")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    if verify(fixtures):
+        sys.exit(1)
+
+    print(f"{'path':<8} {'cpu µs/item':>12} {'peak alloc KB':>14}")
+    for name, func in (("loader", loader_path), ("fast", extract_listing)):
+        cpu_us, peak = measure(func, fixtures, args.repeat)
+        print(f"{name:<8} {cpu_us:>12.1f} {peak / 1024:>14.1f}")
+
+    if args.browser and asyncio.run(browser_compare(fixtures, max(1, args.repeat // 10))):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Записує живі сторінки auto.ria.com у корпус фікстур для benchmarks/replay.py.
+• сторінки пошуку — звичайним HTTP, як їх бере spider (LISTING_PAGES_PLAYWRIGHT = False);
+• картки авто — через Playwright (Firefox) після повного завантаження, без кліку по телефону.
+Телефони в корпус не потрапляють: phones.json доповнюється null-ами, номер можна вписати вручну.
+
+    python benchmarks/record_fixtures.py --pages 3 --cars 10
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+import requests
+from parsel import Selector
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+START_URL = "https://auto.ria.com/uk/car/used/"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+
+
+def record_listing_pages(pages):
+    car_urls = []
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    for number in range(1, pages + 1):
+        url = START_URL if number == 1 else f"{START_URL}?page={number}"
+        response = session.get(url, timeout=30)
+        response.raise_for_status()
+        (FIXTURES / "listing_pages" / f"page_{number}.html").write_text(response.text, encoding="utf-8")
+        sel = Selector(text=response.text)
+        # Ті самі селектори, що в AutoriaSpider.parse
+        for car in sel.css('section.ticket-item'):
+            href = car.css('a.m-link-ticket::attr(href), a.address::attr(href)').get()
+            if href and href.startswith('http') and 'newauto' not in href.lower():
+                car_urls.append(href)
+        print(f"📄 {url}: {len(sel.css('section.ticket-item'))} tickets")
+    return list(dict.fromkeys(car_urls))
+
+
+async def record_car_pages(urls):
+    from playwright.async_api import async_playwright
+
+    phones_path = FIXTURES / "car_pages" / "phones.json"
+    phones = json.loads(phones_path.read_text(encoding="utf-8")) if phones_path.exists() else {}
+    async with async_playwright() as p:
+        browser = await p.firefox.launch(headless=True)
+        page = await (await browser.new_context(user_agent=USER_AGENT)).new_page()
+        for url in urls:
+            await page.goto(url, wait_until="load", timeout=60000)
+            name = url.rstrip("/").rsplit("/", 1)[-1]
+            (FIXTURES / "car_pages" / name).write_text(await page.content(), encoding="utf-8")
+            phones.setdefault(name, None)
+            print(f"🚗 {name}")
+        await browser.close()
+    phones_path.write_text(json.dumps(phones, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3, help="listing pages to record")
+    parser.add_argument("--cars", type=int, default=10, help="car pages to record from those listings")
+    args = parser.parse_args()
+
+    (FIXTURES / "listing_pages").mkdir(parents=True, exist_ok=True)
+    (FIXTURES / "car_pages").mkdir(parents=True, exist_ok=True)
+    car_urls = record_listing_pages(args.pages)
+    asyncio.run(record_car_pages(car_urls[:args.cars]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Офлайн-прогін краулу на корпусі фікстур (benchmarks/fixtures) без мережі.
+Сторінки пошуку йдуть через AutoriaSpider.parse (селектори, дедуплікація Bloom + Redis,
+пагінація), запити на картки обслуговуються HTML-ом з car_pages, далі — витягування
+(CAR_EXTRACTION_MODE "fast" або "loader") і PostgreSQLPipeline з батч-записом.
+
+Потрібні локальні PostgreSQL і Redis (напр. `docker compose up -d postgres redis`):
+таблиці створюються міграціями в окремій схемі bench_replay, ключі Redis — з префіксом
+bench:, після прогону все видаляється (--keep — залишити).
+
+Звіт: items/sec, латентність кожного етапу (p50/p95/max), пам'ять (RSS і tracemalloc).
+
+    python benchmarks/replay.py --scale 50 --mode fast
+    python benchmarks/replay.py --scale 50 --passes 2   # другий прохід — усе вже в БД
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+
+import psycopg2
+import redis
+from dotenv import load_dotenv
+from psycopg2.extensions import make_dsn
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scraper_autoria.bloom import BloomFilter, listing_key  # noqa: E402
+from scraper_autoria.extraction import extract_listing  # noqa: E402
+from scraper_autoria.pipelines import PostgreSQLPipeline  # noqa: E402
+from scraper_autoria.spiders.autoria import AutoriaSpider  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+SCHEMA = "bench_replay"
+LISTING_URL = "https://auto.ria.com/uk/car/used/?page={}"
+LISTING_ID_RE = re.compile(r'_(\d+)\.html')
+
+
+class StageTimer:
+    """Латентність етапів: назва -> список тривалостей у секундах."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def track(self, stage, started):
+        self.samples[stage].append(time.perf_counter() - started)
+
+    def report(self):
+        print(f"\n{'stage':<22} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9}")
+        for stage, values in self.samples.items():
+            ordered = sorted(values)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            print(f"{stage:<22} {len(values):>7} {median(values) * 1e3:>9.3f} {p95 * 1e3:>9.3f} "
+                  f"{ordered[-1] * 1e3:>9.3f} {sum(values):>9.3f}")
+
+
+def load_corpus():
+    listings = sorted(FIXTURES.glob("listing_pages/page_*.html"), key=lambda p: int(p.stem.split("_")[1]))
+    cars = sorted(FIXTURES.glob("car_pages/*.html"))
+    phones = json.loads((FIXTURES / "car_pages" / "phones.json").read_text(encoding="utf-8"))
+    return (
+        [path.read_text(encoding="utf-8") for path in listings],
+        {path.name: (path.read_text(encoding="utf-8"), phones.get(path.name)) for path in cars},
+    )
+
+
+def shift_listing_ids(html, offset):
+    """Копія сторінки пошуку з іншими ID оголошень — для --scale без нових фікстур."""
+    if not offset:
+        return html
+    return LISTING_ID_RE.sub(lambda m: f"_{int(m.group(1)) + offset}.html", html)
+
+
+def car_page_for(url, cars, names):
+    """Записана картка з тим самим ім'ям файлу або, якщо її немає, одна з корпусу по колу."""
+    name = url.rsplit("/", 1)[-1]
+    if name in cars:
+        return cars[name]
+    key = listing_key(name)
+    return cars[names[int(key) % len(names) if key.isdigit() else 0]]
+
+
+async def replay(spider, pipeline, listings, cars, args, timer):
+    names = sorted(cars)
+    items = 0
+    for copy in range(args.scale):
+        offset = copy * 10_000_000
+        for number, html in enumerate(listings, start=1):
+            url = LISTING_URL.format(number)
+            response = HtmlResponse(url=url, body=shift_listing_ids(html, offset).encode("utf-8"),
+                                    encoding="utf-8", request=Request(url, meta={}))
+            started = time.perf_counter()
+            requests = [request async for request in spider.parse(response)]
+            timer.track("spider.parse", started)
+
+            for request in requests:
+                if request.callback != spider.parse_car_page:
+                    continue  # наступна сторінка пошуку — її відтворює цей самий цикл
+                car_html, phone = car_page_for(request.url, cars, names)
+
+                started = time.perf_counter()
+                if args.mode == "fast":
+                    item = extract_listing(car_html, request.url, phone)
+                else:
+                    item = spider._load_item(car_html, request.url, phone)
+                spider.bloom.add(listing_key(request.url))
+                timer.track(f"extract.{args.mode}", started)
+
+                started = time.perf_counter()
+                pipeline.process_item(item, spider)
+                timer.track("pipeline.process_item", started)
+                items += 1
+    return items
+
+
+async def replay_passes(spider, pipeline, listings, cars, args, timer):
+    # Один event loop на всі проходи — async Redis-клієнт spider-а прив'язаний до нього
+    items = 0
+    for _ in range(args.passes):
+        items += await replay(spider, pipeline, listings, cars, args, timer)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="copies of the listing corpus with shifted ids")
+    parser.add_argument("--passes", type=int, default=1, help="replay the same corpus N times")
+    parser.add_argument("--mode", choices=("fast", "loader"), default="fast")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--tracemalloc", action="store_true", help="track Python allocations (slower)")
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema and Redis keys")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    redis_key = f"bench:{SCHEMA}:scraped_urls"
+    checkpoint_key = f"bench:{SCHEMA}:checkpoint"
+    with psycopg2.connect(database_url) as conn, conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    conn.close()
+    r = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=6379, db=0)
+    r.delete(redis_key, f"{redis_key}:synced_at", checkpoint_key, f"{checkpoint_key}:pending")
+
+    crawler = get_crawler(AutoriaSpider, {
+        # Той самий DATABASE_URL, але всі таблиці — в окремій схемі
+        "DATABASE_URL": make_dsn(database_url, options=f"-csearch_path={SCHEMA},public"),
+        "REDIS_SCRAPED_URLS_KEY": redis_key,
+        "CRAWL_CHECKPOINT_KEY": checkpoint_key,
+        "POSTGRES_BATCH_SIZE": args.batch_size,
+        "POSTGRES_FLUSH_INTERVAL": 0,
+        "CAR_EXTRACTION_MODE": args.mode,
+        "LOG_LEVEL": "WARNING",
+    })
+    spider = AutoriaSpider.from_crawler(crawler)
+    crawler.spider = spider
+    # Як після spider_opened на порожній БД: фільтр готовий, Redis-множина порожня
+    spider.bloom = BloomFilter(spider.bloom_capacity, spider.bloom_error_rate)
+    spider.bloom_ready = True
+
+    listings, cars = load_corpus()
+    timer = StageTimer()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    pipeline = PostgreSQLPipeline.from_crawler(crawler)
+    started = time.perf_counter()
+    pipeline.open_spider(spider)
+    timer.track("pipeline.open", started)
+
+    wall = time.perf_counter()
+    items = asyncio.run(replay_passes(spider, pipeline, listings, cars, args, timer))
+    started = time.perf_counter()
+    pipeline.close_spider(spider)
+    timer.track("pipeline.close", started)
+    wall = time.perf_counter() - wall
+
+    print(f"Replayed {len(listings) * args.scale * args.passes} listing pages, {items} items "
+          f"in {wall:.2f}s -> {items / wall:.1f} items/sec (mode={args.mode}, batch={args.batch_size})")
+    timer.report()
+
+    print("\nmemory:")
+    print(f"  max RSS           {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"  tracemalloc       {current / 2**20:.1f} MB now, {peak / 2**20:.1f} MB peak")
+    print(f"  bloom filter      {spider.bloom.size // 8 / 2**20:.1f} MB, {len(spider.bloom)} listings")
+
+    print("\nstats:")
+    for key, value in sorted(crawler.stats.get_stats().items()):
+        if key.startswith(("dedup/", "postgres/")):
+            print(f"  {key:<32} {value}")
+
+    if not args.keep:
+        with psycopg2.connect(database_url) as conn, conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        conn.close()
+        r.delete(redis_key, checkpoint_key, f"{checkpoint_key}:pending")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+EXPLAIN-бенчмарк /cars/search на синтетичній таблиці.
+Створює окрему схему bench_search у базі DATABASE_URL, застосовує ті самі міграції,
+генерує N рядків і перевіряє, що кожен фільтр виконується через індекс, а не Seq Scan.
+
+    python benchmarks/search_plans.py --rows 1000000
+    python benchmarks/search_plans.py --rows 1000000 --keep   # не видаляти схему
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import psycopg
+from psycopg import sql
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from car_search import SearchFilters, build_search_query  # noqa: E402
+from scraper_autoria.migrations import apply_migrations  # noqa: E402
+
+SCHEMA = "bench_search"
+COLUMNS = ("id", "url", "title", "price_usd", "odometer", "car_number", "car_vin", "datetime_found")
+
+FILL_SQL = """
+INSERT INTO car_products (url, title, price_usd, odometer, car_number, car_vin, datetime_found)
+SELECT 'https://auto.ria.com/uk/auto_bench_' || g || '.html',
+       CASE WHEN g %% 100000 = 0 THEN 'Lamborghini Urus ' || (2015 + g %% 10)
+            ELSE (ARRAY['Volkswagen Golf', 'Skoda Octavia', 'BMW X5', 'Toyota Camry', 'Renault Megane',
+                        'Audi A6', 'Ford Focus', 'Nissan Qashqai', 'Kia Sportage', 'Hyundai Tucson',
+                        'Mercedes-Benz E-Class', 'Opel Astra'])[1 + g %% 12] || ' ' || (2000 + g %% 25)
+       END,
+       1000 + (g * 7919) %% 99000,
+       (g * 104729) %% 500000,
+       chr(65 + g %% 26) || chr(65 + (g / 26) %% 26) || ' ' || lpad((g %% 10000)::text, 4, '0')
+           || ' ' || chr(65 + (g / 7) %% 26) || chr(65 + (g / 11) %% 26),
+       upper(substr(md5(g::text), 1, 17)),
+       now() - (g %% 730) * interval '1 day'
+FROM generate_series(1, %s) AS g
+"""
+
+
+def probe_row(cur, n):
+    cur.execute("SELECT car_vin, car_number FROM car_products WHERE url = %s",
+                (f"https://auto.ria.com/uk/auto_bench_{n // 2}.html",))
+    return cur.fetchone()
+
+
+def scenarios(vin, plate):
+    day = date.today() - timedelta(days=100)
+    return {
+        "price range": SearchFilters(price_min=20000, price_max=20100),
+        "odometer range": SearchFilters(odometer_min=120000, odometer_max=120500),
+        "title substring": SearchFilters(title="urus"),
+        "brand": SearchFilters(brand="Lamborghini"),
+        "vin": SearchFilters(vin=vin.lower()),
+        "plate": SearchFilters(plate=plate.replace(" ", "").lower()),
+        "date found": SearchFilters(found_from=day, found_to=day),
+        "price + odometer": SearchFilters(price_min=20000, price_max=20500, odometer_max=50000),
+        "no filters (latest)": SearchFilters(),
+    }
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_search schema")
+    args = parser.parse_args()
+
+    load_dotenv()
+    with psycopg.connect(os.getenv("DATABASE_URL")) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        conn.execute(f"SET search_path TO {SCHEMA}, public")
+        conn.commit()
+        apply_migrations(conn)
+
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(FILL_SQL, (args.rows,))
+            cur.execute("ANALYZE car_products")
+            vin, plate = probe_row(cur, args.rows)
+        conn.commit()
+        print(f"Generated {args.rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'scenario':<22} {'ms':>9} {'rows':>6}  {'seq scan':<9} plan")
+        failed = []
+        with conn.cursor() as cur:
+            for name, filters in scenarios(vin, plate).items():
+                query, params = build_search_query(filters, COLUMNS, args.limit)
+                cur.execute(sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ") + query, params)
+                explain = cur.fetchone()[0][0]
+                nodes = list(plan_nodes(explain["Plan"]))
+                node_types = sorted({f"{n['Node Type']}({n['Index Name']})" if "Index Name" in n else n["Node Type"]
+                                     for n in nodes})
+                seq_scan = any(n["Node Type"] == "Seq Scan" for n in nodes)
+                if seq_scan:
+                    failed.append(name)
+                print(f"{name:<22} {explain['Execution Time']:>9.2f} {explain['Plan']['Actual Rows']:>6}  "
+                      f"{'YES' if seq_scan else 'no':<9} {', '.join(node_types)}")
+
+        if not args.keep:
+            conn.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+            conn.commit()
+
+    if failed:
+        print(f"\nSeq Scan in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
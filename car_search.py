@@ -0,0 +1,69 @@
+"""
+Побудова запиту /cars/search. Кожен фільтр спирається на індекс
+з міграції 003_search_indexes.sql (btree, trigram, вирази для VIN/номера).
+Винесено окремо від API, щоб benchmarks/search_plans.py перевіряв ті самі запити.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from psycopg import sql
+
+
+@dataclass
+class SearchFilters:
+    price_min: int | None = None
+    price_max: int | None = None
+    odometer_min: int | None = None
+    odometer_max: int | None = None
+    title: str | None = None        # підрядок назви (trigram)
+    brand: str | None = None        # початок назви: "BMW" -> "BMW X5 2019"
+    vin: str | None = None
+    plate: str | None = None        # "AX 4782 HI" == "ax4782hi"
+    found_from: date | None = None
+    found_to: date | None = None    # включно
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def normalize_plate(value: str) -> str:
+    return value.replace(" ", "").upper()
+
+
+def build_search_query(filters: SearchFilters, columns, limit: int, before_id: int | None = None):
+    """Повертає (query, params); результат — найновіші першими, keyset по id."""
+    conditions, params = [], []
+
+    def add(condition, *values):
+        conditions.append(sql.SQL(condition))
+        params.extend(values)
+
+    if filters.price_min is not None:
+        add("price_usd >= %s", filters.price_min)
+    if filters.price_max is not None:
+        add("price_usd <= %s", filters.price_max)
+    if filters.odometer_min is not None:
+        add("odometer >= %s", filters.odometer_min)
+    if filters.odometer_max is not None:
+        add("odometer <= %s", filters.odometer_max)
+    if filters.title:
+        add("title ILIKE %s", f"%{_like_escape(filters.title)}%")
+    if filters.brand:
+        add("title ILIKE %s", f"{_like_escape(filters.brand)}%")
+    if filters.vin:
+        add("car_vin = %s", filters.vin.strip().upper())
+    if filters.plate:
+        add("upper(replace(car_number, ' ', '')) = %s", normalize_plate(filters.plate))
+    if filters.found_from is not None:
+        add("datetime_found >= %s", filters.found_from)
+    if filters.found_to is not None:
+        add("datetime_found < %s::date + 1", filters.found_to)
+    if before_id is not None:
+        add("id < %s", before_id)
+
+    where = sql.SQL("WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("")
+    query = sql.SQL("SELECT {columns} FROM car_listings {where} ORDER BY id DESC LIMIT %s").format(
+        columns=sql.SQL(", ").join(map(sql.Identifier, columns)), where=where)
+    params.append(limit)
+    return query, params
@@ -0,0 +1,89 @@
+"""
+Статистика для /stats без повного сканування car_products на кожен запит.
+• лічильники по днях (car_stats_daily) інкрементує pipeline під час запису;
+• перцентилі ціни/пробігу — materialized view, яку фонова задача оновлює
+  раз на STATS_REFRESH_SECONDS;
+• готова відповідь кешується в пам'яті на STATS_CACHE_TTL секунд.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from psycopg_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 60))
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", 3600))
+PERCENTILES = (10, 25, 50, 75, 90)  # той самий порядок, що й ARRAY[...] у 002_car_stats.sql
+
+
+class StatsCache:
+    def __init__(self, pool: AsyncConnectionPool, ttl: float = STATS_CACHE_TTL):
+        self.pool = pool
+        self.ttl = ttl
+        self._cache = {}  # days -> (час обчислення, відповідь)
+        self._lock = asyncio.Lock()
+
+    async def get(self, days: int):
+        cached = self._cache.get(days)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        async with self._lock:  # одночасні запити після закінчення TTL не б'ють в БД усі разом
+            cached = self._cache.get(days)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            stats = await self._load(days)
+            self._cache[days] = (time.monotonic(), stats)
+            return stats
+
+    def clear(self):
+        self._cache.clear()
+
+    async def _load(self, days: int):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT COALESCE(SUM(found), 0), COALESCE(SUM(with_phone), 0) FROM car_stats_daily")
+            total, with_phone = await cur.fetchone()
+            cur = await conn.execute(
+                "SELECT day, found, with_phone FROM car_stats_daily ORDER BY day DESC LIMIT %s", (days,))
+            per_day = await cur.fetchall()
+            cur = await conn.execute("SELECT price_usd, odometer, refreshed_at FROM car_stats_percentiles")
+            percentiles = await cur.fetchone()
+
+        price, odometer, refreshed_at = percentiles or (None, None, None)
+        return {
+            "Number of products in DB": total,
+            "phone_success_ratio": round(with_phone / total, 4) if total else None,
+            "found_per_day": [
+                {"day": day.isoformat(), "found": found, "with_phone": phones}
+                for day, found, phones in per_day
+            ],
+            "price_usd_percentiles": _label_percentiles(price),
+            "odometer_percentiles": _label_percentiles(odometer),
+            "percentiles_refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+        }
+
+
+def _label_percentiles(values):
+    if not values:
+        return None
+    return {f"p{p}": value for p, value in zip(PERCENTILES, values)}
+
+
+async def refresh_percentiles(pool: AsyncConnectionPool):
+    # CONCURRENTLY — /stats читає старі значення, поки рахуються нові
+    async with pool.connection() as conn:
+        await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY car_stats_percentiles")
+
+
+async def refresh_loop(pool: AsyncConnectionPool, cache: StatsCache, interval: float = STATS_REFRESH_SECONDS):
+    """Фонова задача API: періодично перераховує перцентилі і скидає кеш."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_percentiles(pool)
+            cache.clear()
+        except Exception as e:
+            logger.error(f"Stats refresh failed: {e}")
@@ -12,4 +12,7 @@ CREATE TABLE IF NOT EXISTS car_products (
     car_vin TEXT,                       -- VIN number
     datetime_found TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     datetime_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+-- Incremental Redis sync reads rows changed since the last watermark
+CREATE INDEX IF NOT EXISTS car_products_changed_at_idx
+    ON car_products ((GREATEST(datetime_found, datetime_updated)));
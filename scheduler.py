@@ -2,9 +2,12 @@ import os
 import sys
 import subprocess
 from datetime import datetime
+import psycopg2
+import redis
 from apscheduler.schedulers.blocking import BlockingScheduler
 from dotenv import load_dotenv
 load_dotenv()
+from scraper_autoria import recheck
 
 
 # Визначаємо шляхи
@@ -16,14 +19,16 @@ else:
 # Налаштування
 SPIDER_TIME = os.getenv('SPIDER_TIME')
 DUMP_TIME = os.getenv('DUMP_TIME')
+# Черга повторної перевірки; павук добирає її лише після нових карток, тож можна й разом зі SPIDER_TIME
+RECHECK_TIME = os.getenv('RECHECK_TIME') or SPIDER_TIME
 DUMP_DIR = os.path.join(BASE_DIR, 'dumps')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 # Створюємо теку для DUMPS, якщо немає
 os.makedirs(DUMP_DIR, exist_ok=True)
 
 
-def run_spider():
-    """Запуск Scrapy павука"""
+def run_spider(full_sweep=False):
+    """Запуск Scrapy павука (інкрементальний; full_sweep — пройти всю пагінацію)"""
 
     print(f"[{datetime.now()}] 🕷️ Launching Scrapy spider...")
     # Використовуємо subprocess, щоб Scrapy запускався в окремому процесі
@@ -35,6 +40,8 @@ def run_spider():
         log_file = f"{LOG_DIR}/spider_{timestamp}.log"
         cmd = [sys.executable, '-m', 'scrapy', 'crawl', 'autoria',
                '-s','LOG_LEVEL=INFO', '-s', f'LOG_FILE={log_file}']
+        if full_sweep:
+            cmd += ['-s', 'CRAWL_FULL_SWEEP=true']
         subprocess.run(cmd, check=True, capture_output=True, text=True)
     except Exception as e:
         print(f"❌ Error spider: {e}")
@@ -42,6 +49,22 @@ def run_spider():
         os.chdir(original_dir)
 
 
+def queue_rechecks():
+    """Денна черга повторної перевірки старих оголошень (recheck.queue_rechecks)"""
+    print(f"[{datetime.now()}] 🔁 Selecting listings for re-check...")
+    conn = None
+    try:
+        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+        r = redis.Redis(host=os.getenv('REDIS_HOST', 'localhost'), port=6379, db=0, decode_responses=True)
+        queued, removed = recheck.queue_rechecks(conn, r)
+        print(f"✅ {queued} listings queued for re-check, {removed} marked as removed")
+    except Exception as e:
+        print(f"❌ Re-check queue failed: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
 def dump_db():
     """Створення backup бази даних PostgreSQL"""
     print(f"[{datetime.now()}] 💾 Creating database dump...")
@@ -82,12 +105,14 @@ def main():
     # Розбиваємо час HH:MM
     s_hour, s_minute = SPIDER_TIME.split(':')
     d_hour, d_minute = DUMP_TIME.split(':')
+    r_hour, r_minute = RECHECK_TIME.split(':')
 
     # Додаємо задачі
     scheduler.add_job(run_spider, 'cron', hour=s_hour, minute=s_minute)
     scheduler.add_job(dump_db, 'cron', hour=d_hour, minute=d_minute)
+    scheduler.add_job(queue_rechecks, 'cron', hour=r_hour, minute=r_minute)
 
-    print(f"⏰ Scheduler started. Spider at {SPIDER_TIME}, Dump at {DUMP_TIME}")
+    print(f"⏰ Scheduler started. Spider at {SPIDER_TIME}, Dump at {DUMP_TIME}, Re-check queue at {RECHECK_TIME}")
 
     # Якщо треба запустити одразу (для тесту)
     if os.getenv('RUN_SPIDER_NOW', 'false').lower() == 'true':
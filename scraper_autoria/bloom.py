@@ -0,0 +1,93 @@
+import hashlib
+import json
+import math
+import os
+import re
+
+LISTING_ID_RE = re.compile(r'_(\d+)\.html')
+
+
+def listing_key(url):
+    """
+    Ключ оголошення для фільтра: ID з суфікса `_NNNNNNNN.html`,
+    або сам url, якщо ID не знайдено.
+    """
+    match = LISTING_ID_RE.search(url)
+    return match.group(1) if match else url
+
+
+def listing_id(url):
+    """Числовий ID оголошення (колонка car_products.listing_id) або None."""
+    match = LISTING_ID_RE.search(url)
+    return int(match.group(1)) if match else None
+
+
+class BloomFilter:
+    """
+    Компактний ймовірнісний фільтр вже зібраних оголошень.
+    • `key in bloom` == False — оголошення точно нове.
+    • `key in bloom` == True — майже напевно вже є (хибно-позитивні з ймовірністю error_rate).
+    2 млн ключів при error_rate=0.001 займають ~3.6 MB.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Подвійне хешування: k позицій з двох 64-бітних половин одного blake2b
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        """Додає ключ; повертає False, якщо він (ймовірно) вже був у фільтрі."""
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1  # count ~ кількість унікальних ключів, повтори не рахуються
+        return added
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    # ------------------------------------------------------------------ #
+    # Snapshot: один рядок JSON-заголовка + сирі біти
+    # ------------------------------------------------------------------ #
+    def save(self, path, **meta):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        header = dict(meta, capacity=self.capacity, error_rate=self.error_rate, count=self.count)
+        tmp_path = f"{path}.{os.getpid()}.tmp"  # воркери можуть ділити один том
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            f.write(self.bits)
+        os.replace(tmp_path, path)  # атомарно: обірваний запис не псує попередній snapshot
+
+    @classmethod
+    def load(cls, path):
+        """Повертає (BloomFilter, header) зі snapshot-файлу."""
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            bloom = cls(header['capacity'], header['error_rate'])
+            bits = f.read()
+        if len(bits) != len(bloom.bits):
+            raise ValueError(f"Corrupted bloom snapshot {path}")
+        bloom.bits = bytearray(bits)
+        bloom.count = header.get('count', 0)
+        return bloom, header
@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+
+class ContextPool:
+    """
+    Пул "теплих" іменованих контекстів Playwright для карток авто.
+    • контексти роздаються по колу: car-<slot>-<generation>.
+    • після `max_uses` оголошень слот переходить на нове покоління, а старий
+      контекст закривається, щойно на ньому завершиться остання сторінка.
+    • `consented` — контексти, де cookie-банер уже оброблено.
+    """
+
+    def __init__(self, size, max_uses):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.generation = [0] * self.size
+        self.assigned = [0] * self.size  # скільки оголошень видано поточному поколінню слоту
+        self.open_pages = defaultdict(int)  # назва контексту -> запити/сторінки в роботі
+        self.consented = set()
+        self._next_slot = 0
+
+    def acquire(self):
+        """Назва контексту для наступного запиту картки."""
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.size
+        if self.assigned[slot] >= self.max_uses:
+            self.generation[slot] += 1
+            self.assigned[slot] = 0
+        self.assigned[slot] += 1
+        name = f"car-{slot}-{self.generation[slot]}"
+        self.open_pages[name] += 1
+        return name
+
+    def release(self, name):
+        """
+        Повертає True, якщо контекст відслужив своє і сторінок на ньому більше немає —
+        тоді його треба закрити.
+        """
+        if name not in self.open_pages:
+            return False
+        self.open_pages[name] -= 1
+        if self.open_pages[name] > 0 or not self._retired(name):
+            return False
+        del self.open_pages[name]
+        self.consented.discard(name)
+        return True
+
+    def _retired(self, name):
+        # Відслужив: слот уже на новому поколінні або цьому видано всі max_uses оголошень
+        _, slot, generation = name.split('-')
+        slot, generation = int(slot), int(generation)
+        return generation < self.generation[slot] or self.assigned[slot] >= self.max_uses
@@ -0,0 +1,263 @@
+import logging
+import os
+import queue
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from statistics import median
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .telemetry import JsonFormatter, stage_finished
+
+try:
+    from prometheus_client import CollectorRegistry, Histogram, start_http_server
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # експортер необов'язковий
+    CollectorRegistry = None
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveThrottle:
+    """
+    Замість AutoThrottle: підлаштовує delay і concurrency кожного download-слота
+    за живими сигналами краулу.
+    • частка 403/429 (ADAPTIVE_THROTTLE_BAN_CODES) або провалів телефону вище цілі —
+      мультиплікативний відкат: delay ×2, concurrency ÷2.
+    • медіана часу рендеру Playwright-сторінки вище ADAPTIVE_THROTTLE_TARGET_LATENCY — delay += step.
+    • інакше — адитивний розгін: concurrency +1, delay ×0.8.
+    Рішення приймаються раз на ADAPTIVE_THROTTLE_WINDOW відповідей слота і пишуться в stats
+    (adaptive_throttle/*).
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_THROTTLE_ENABLED'):
+            raise NotConfigured
+        self.crawler = crawler
+        self.stats = crawler.stats
+
+        self.min_delay = settings.getfloat('ADAPTIVE_THROTTLE_MIN_DELAY', 0.5)
+        self.max_delay = settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 60)
+        self.start_delay = max(self.min_delay, settings.getfloat('DOWNLOAD_DELAY', 3))
+        self.delay_step = settings.getfloat('ADAPTIVE_THROTTLE_DELAY_STEP', 1)
+        self.max_concurrency = settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY',
+                                               settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 8))
+        self.window = settings.getint('ADAPTIVE_THROTTLE_WINDOW', 20)
+        self.ban_codes = {int(code) for code in settings.getlist('ADAPTIVE_THROTTLE_BAN_CODES', [403, 429])}
+        self.target_ban_rate = settings.getfloat('ADAPTIVE_THROTTLE_TARGET_BAN_RATE', 0.05)
+        self.target_phone_rate = settings.getfloat('ADAPTIVE_THROTTLE_TARGET_PHONE_RATE', 0.7)
+        self.target_latency = settings.getfloat('ADAPTIVE_THROTTLE_TARGET_LATENCY', 15)
+
+        # download-слот -> сигнали поточного вікна
+        self.responses = defaultdict(int)
+        self.banned = defaultdict(int)
+        self.latencies = defaultdict(list)
+        self._phone_seen = (0, 0)  # (успіхи, провали) на момент останнього рішення
+
+        crawler.signals.connect(self._response_downloaded, signal=signals.response_downloaded)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _response_downloaded(self, response, request, spider):
+        key = request.meta.get('download_slot')
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return
+
+        if not getattr(slot, 'adaptive_throttle', False):
+            slot.adaptive_throttle = True
+            slot.delay = self.start_delay
+
+        self.responses[key] += 1
+        if response.status in self.ban_codes:
+            self.banned[key] += 1
+            self.stats.inc_value(f'adaptive_throttle/status/{response.status}')
+        latency = request.meta.get('download_latency')
+        # Час рендеру рахуємо тільки для браузерних запитів — HTTP-сторінки пошуку швидкі
+        if latency is not None and request.meta.get('playwright'):
+            self.latencies[key].append(latency)
+
+        if self.responses[key] >= self.window:
+            self._adjust(key, slot)
+
+    def _adjust(self, key, slot):
+        ban_rate = self.banned.pop(key, 0) / self.responses.pop(key)
+        latencies = self.latencies.pop(key, [])
+        render_time = median(latencies) if latencies else None
+        phone_rate = self._phone_success_rate()
+
+        if ban_rate > self.target_ban_rate or (phone_rate is not None and phone_rate < self.target_phone_rate):
+            decision = 'backoff'
+            slot.delay = min(self.max_delay, max(slot.delay * 2, self.min_delay + self.delay_step))
+            slot.concurrency = max(1, slot.concurrency // 2)
+        elif render_time is not None and render_time > self.target_latency:
+            decision = 'slowdown'
+            slot.delay = min(self.max_delay, slot.delay + self.delay_step)
+        else:
+            decision = 'speedup'
+            slot.delay = max(self.min_delay, slot.delay * 0.8)
+            slot.concurrency = min(self.max_concurrency, slot.concurrency + 1)
+
+        self.stats.inc_value(f'adaptive_throttle/decisions/{decision}')
+        self.stats.set_value('adaptive_throttle/delay', round(slot.delay, 2))
+        self.stats.set_value('adaptive_throttle/concurrency', slot.concurrency)
+        self.stats.set_value('adaptive_throttle/ban_rate', round(ban_rate, 3))
+        if render_time is not None:
+            self.stats.set_value('adaptive_throttle/render_time', round(render_time, 2))
+        if phone_rate is not None:
+            self.stats.set_value('adaptive_throttle/phone_rate', round(phone_rate, 3))
+        logger.info(
+            f"🎚️ {decision} [{key}]: delay={slot.delay:.2f}s concurrency={slot.concurrency} "
+            f"ban_rate={ban_rate:.2%} render={render_time} phone_rate={phone_rate}"
+        )
+
+    def _phone_success_rate(self):
+        """Частка успішних телефонів з моменту попереднього рішення (None — мало даних)."""
+        ok = sum(self.stats.get_value(f'phone/{k}', 0) for k in ('api_replay', 'xhr', 'dom'))
+        failed = self.stats.get_value('phone/failed', 0)
+        prev_ok, prev_failed = self._phone_seen
+        self._phone_seen = (ok, failed)
+        total = (ok - prev_ok) + (failed - prev_failed)
+        if total < 5:
+            return None
+        return (ok - prev_ok) / total
+
+
+class PrometheusMetrics:
+    """
+    Prometheus-ендпоінт краулу (PROMETHEUS_ADDR:PROMETHEUS_PORT/metrics).
+    • autoria_stage_seconds{stage} — гістограма етапів: listing_download, listing_parse,
+      navigation, cookie_banner, seller_wait, phone, page_content / page_evaluate,
+      item_loading, car_page (вся обробка картки після завантаження), db_write.
+    • autoria_stat_total{stat} — лічильники Scrapy stats: dedup/*, phone/*, postgres/*,
+      retry/*, downloader/response_status_count/* тощо (PROMETHEUS_STATS_PREFIXES).
+    • gauges зайнятості: запити в downloader-і, резервації ContextPool (картки, яким уже
+      призначено контекст, — від входу в downloader до закриття сторінки, а не відкриті
+      сторінки браузера) і контексти з такими резерваціями,
+      батчі, що пишуться в БД.
+    Потрібен пакет prometheus-client; без нього розширення вимикається.
+    """
+
+    BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90)
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PROMETHEUS_ENABLED'):
+            raise NotConfigured
+        if CollectorRegistry is None:
+            logger.warning("prometheus-client is not installed, metrics endpoint disabled")
+            raise NotConfigured
+        self.crawler = crawler
+        self.port = settings.getint('PROMETHEUS_PORT', 9410)
+        self.addr = settings.get('PROMETHEUS_ADDR', '0.0.0.0')
+        self.stats_prefixes = tuple(settings.getlist('PROMETHEUS_STATS_PREFIXES'))
+
+        # Власний registry: кілька краулерів в одному процесі не конфліктують
+        self.registry = CollectorRegistry()
+        self.stages = Histogram('autoria_stage_seconds', 'Duration of crawl stages', ['stage'],
+                                buckets=self.BUCKETS, registry=self.registry)
+        self.registry.register(self)
+
+        crawler.signals.connect(self._stage_finished, signal=stage_finished)
+        crawler.signals.connect(self._response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(self._spider_opened, signal=signals.spider_opened)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _spider_opened(self, spider):
+        try:
+            start_http_server(self.port, addr=self.addr, registry=self.registry)
+            logger.info(f"📈 Prometheus metrics on http://{self.addr}:{self.port}/metrics")
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started: {e}")
+
+    def _stage_finished(self, stage, seconds):
+        self.stages.labels(stage).observe(seconds)
+
+    def _response_downloaded(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            # Для Playwright-запитів це goto() + очікування `load`, для пошуку — HTTP-запит
+            self.stages.labels('navigation' if request.meta.get('playwright') else 'listing_download').observe(latency)
+
+    def collect(self):
+        """Викликається потоком HTTP-сервера на кожен scrape."""
+        stats = dict(self.crawler.stats.get_stats())  # копія: реактор тим часом оновлює stats
+        counters = CounterMetricFamily('autoria_stat', 'Scrapy stats counters', labels=['stat'])
+        for key, value in stats.items():
+            if key.startswith(self.stats_prefixes) and isinstance(value, (int, float)):
+                counters.add_metric([key], value)
+        yield counters
+
+        occupancy = GaugeMetricFamily('autoria_pool_occupancy', 'Pool and queue occupancy', labels=['pool'])
+        engine = self.crawler.engine
+        if engine is not None and engine.downloader is not None:
+            occupancy.add_metric(['downloader_active'], len(engine.downloader.active))
+        context_pool = getattr(self.crawler.spider, 'context_pool', None)
+        if context_pool is not None:
+            open_pages = dict(context_pool.open_pages)
+            occupancy.add_metric(['context_pool_reservations'], sum(open_pages.values()))
+            occupancy.add_metric(['context_pool_reserved_contexts'], len(open_pages))
+        occupancy.add_metric(['postgres_pending_flushes'], stats.get('pipeline/pending_flushes', 0))
+        yield occupancy
+
+
+class QueuedLogFile:
+    """
+    Запис LOG_FILE через чергу: замість файлового handler-а Scrapy на root стоїть QueueHandler,
+    а форматування й запис на диск робить окремий потік QueueListener — реактор не чекає на I/O.
+    • файл ротується за розміром: LOG_MAX_BYTES, LOG_BACKUP_COUNT копій (spider.log.1, .2, ...).
+    • LOG_JSON — рядки у форматі telemetry.JsonFormatter (один JSON-об'єкт на рядок),
+      інакше — звичний текстовий формат Scrapy.
+    Без LOG_FILE (лог у stderr) розширення вимикається.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        log_file = settings.get('LOG_FILE')
+        if not log_file:
+            raise NotConfigured
+        path = os.path.abspath(log_file)
+        root = logging.getLogger()
+        # Handler, який поставив configure_logging() Scrapy для цього файлу
+        original = next((h for h in root.handlers
+                         if isinstance(h, logging.FileHandler) and h.baseFilename == path), None)
+        if original is None:
+            raise NotConfigured
+
+        self.file_handler = RotatingFileHandler(
+            path, maxBytes=settings.getint('LOG_MAX_BYTES', 100 * 2**20),
+            backupCount=settings.getint('LOG_BACKUP_COUNT', 5),
+            encoding=settings.get('LOG_ENCODING', 'utf-8'),
+        )
+        self.file_handler.setFormatter(JsonFormatter() if settings.getbool('LOG_JSON') else original.formatter)
+        for log_filter in original.filters:
+            self.file_handler.addFilter(log_filter)
+
+        self.queue_handler = QueueHandler(queue.SimpleQueue())
+        self.queue_handler.setLevel(original.level)
+        root.removeHandler(original)
+        original.close()
+        root.addHandler(self.queue_handler)
+        self.listener = QueueListener(self.queue_handler.queue, self.file_handler)
+        self.listener.start()
+
+        crawler.signals.connect(self._engine_stopped, signal=signals.engine_stopped)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _engine_stopped(self):
+        # Дописуємо чергу; останні рядки процесу (після зупинки рушія) — напряму у файл
+        root = logging.getLogger()
+        root.removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.file_handler.setLevel(self.queue_handler.level)
+        root.addHandler(self.file_handler)
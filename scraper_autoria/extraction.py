@@ -0,0 +1,161 @@
+"""
+Швидкий шлях витягування картки авто без ItemLoader/scrapy.Item.
+• CSS-селектори ті самі, що в ItemLoader-шляху (FIELD_CSS), але перекладаються
+  в XPath і компілюються один раз на модуль (`lxml.etree.XPath`).
+• один обхід полів по вже розібраному lxml-дереву, без SelectorList-ів і
+  проміжних списків процесорів.
+• очищення — ті самі функції з loaders.py і та сама семантика, що дають
+  процесори items.py (TakeFirst пропускає None і '', порожній результат
+  поля — поле відсутнє, тобто None).
+• CAR_EXTRACTION_MODE = "js": ті самі поля збирає один `page.evaluate(EXTRACT_JS, JS_FIELDS)`
+  прямо в браузері — через Playwright іде маленький JSON замість усього HTML сторінки.
+Еквівалентність перевіряє benchmarks/extraction.py на HTML-фікстурах.
+"""
+import re
+from dataclasses import dataclass
+
+from lxml import etree
+from parsel import Selector
+from parsel.csstranslator import css2xpath
+
+from . import loaders as l
+
+# Поле Item-а -> CSS-селектор (спільні для обох шляхів)
+FIELD_CSS = {
+    'title': 'div#basicInfoTitle h1::text, div#sideTitleTitle span::text',
+    'price_usd': 'div#basicInfoPrice strong::text, div#sidePrice strong::text',
+    'odometer': 'div#basicInfoTableMainInfo0 span::text',
+    'username': 'div#sellerInfoUserName span::text',
+    'image_url': 'img::attr(data-src)',
+    'image_count': 'span.common-badge.alpha.medium span::text',
+    'car_number': 'div.car-number span::text',
+    'car_vin': 'span#badgesVin span::text',
+}
+
+# smart_strings=False — звичайні str, як .getall() у parsel
+FIELD_XPATHS = {
+    field: etree.XPath(css2xpath(css), smart_strings=False)
+    for field, css in FIELD_CSS.items()
+}
+
+_PSEUDO_RE = re.compile(r'::(?:text|attr\(([^)]+)\))$')
+
+
+def _js_field(css):
+    """'a::text, b::text' -> ('a, b', None); 'img::attr(data-src)' -> ('img', 'data-src')."""
+    parts, attrs = [], set()
+    for part in css.split(','):
+        part = part.strip()
+        match = _PSEUDO_RE.search(part)
+        attrs.add(match.group(1) if match else None)
+        parts.append(part[:match.start()] if match else part)
+    if len(attrs) != 1:
+        raise ValueError(f"Mixed pseudo-elements in selector group: {css}")
+    return ', '.join(parts), attrs.pop()
+
+
+# Поле -> [CSS без псевдоелемента, атрибут або null для ::text]
+JS_FIELDS = {field: list(_js_field(css)) for field, css in FIELD_CSS.items()}
+
+# ::text у parsel — прямі дочірні текстові вузли, ::attr(x) — атрибут, якщо він є;
+# querySelectorAll для групи селекторів повертає вузли в порядку документа, як XPath-об'єднання
+EXTRACT_JS = """
+(fields) => {
+    const result = {};
+    for (const [name, [css, attr]] of Object.entries(fields)) {
+        const values = [];
+        for (const el of document.querySelectorAll(css)) {
+            if (attr) {
+                if (el.hasAttribute(attr)) values.push(el.getAttribute(attr));
+            } else {
+                for (const node of el.childNodes) {
+                    if (node.nodeType === Node.TEXT_NODE) values.push(node.nodeValue);
+                }
+            }
+        }
+        result[name] = values;
+    }
+    return result;
+}
+"""
+
+
+@dataclass(slots=True)
+class CarListing:
+    """Те саме, що ScraperAutoriaItem після load_item(), але без dict-а і Field-метаданих."""
+    url: str
+    title: str | None = None
+    price_usd: int | None = None
+    odometer: int | None = None
+    username: str | None = None
+    phone_number: list | None = None
+    image_url: list | None = None
+    image_count: int | None = None
+    car_number: str | None = None
+    car_vin: str | None = None
+
+
+def _take_first(values):
+    # TakeFirst: перше значення, що не None і не ''
+    for value in values:
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def _first_cleaned(func, values):
+    # MapCompose(func) + TakeFirst без проміжного списку
+    for value in values:
+        value = func(value)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def listing_from_fields(url, fields, phone_number=None):
+    """
+    CarListing із сирих значень полів ({поле: [рядки]}), з очищенням як у items.py.
+    Спільне для lxml-шляху і для полів, зібраних у браузері.
+    """
+    get = fields.get
+    price_values = get('price_usd')
+    # Compose(MapCompose(str.strip), choose_price, clean_price); 0 ItemLoader відкидає як порожнє
+    price = l.clean_price(l.choose_price([v.strip() for v in price_values])) if price_values else None
+
+    phones = []
+    if phone_number:
+        # MapCompose(clean_phone_list): кожне значення окремо, списки розгортаються, None відкидаються
+        for value in phone_number if isinstance(phone_number, (list, tuple)) else (phone_number,):
+            cleaned = l.clean_phone_list(value)
+            if isinstance(cleaned, list):
+                phones.extend(cleaned)
+            elif cleaned is not None:
+                phones.append(cleaned)
+
+    counts = [c for c in map(l.clean_image_count, get('image_count') or ()) if c is not None]
+
+    return CarListing(
+        url=url,
+        title=_take_first(get('title') or ()),
+        price_usd=price or None,
+        odometer=_first_cleaned(l.clean_odometer, get('odometer') or ()),
+        username=_first_cleaned(l.clean_value, get('username') or ()),
+        phone_number=phones or None,
+        image_url=list(get('image_url') or ()) or None,
+        image_count=l.TakeSecond(counts) if counts else None,
+        car_number=_first_cleaned(l.clean_value, get('car_number') or ()),
+        car_vin=_first_cleaned(l.clean_value, get('car_vin') or ()),
+    )
+
+
+async def evaluate_listing(page, url, phone_number=None):
+    """CarListing із полів, зібраних у браузері одним page.evaluate (без page.content())."""
+    return listing_from_fields(url, await page.evaluate(EXTRACT_JS, JS_FIELDS), phone_number)
+
+
+def extract_listing(html, url, phone_number=None):
+    """CarListing з HTML картки: один розбір і по одному скомпільованому XPath на поле."""
+    root = Selector(text=html).root
+    return listing_from_fields(
+        url, {field: xpath(root) for field, xpath in FIELD_XPATHS.items()}, phone_number
+    )
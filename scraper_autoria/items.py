@@ -12,7 +12,6 @@ class ScraperAutoriaItem(scrapy.Item):
     price_usd = scrapy.Field(
         input_processor=Compose(
             MapCompose(str.strip),  # remove spaces
-            lambda vals: vals,  # put everyone on the list
             l.choose_price,  # select the line with $
             l.clean_price  # convert to int
         ),
@@ -36,8 +35,10 @@ class ScraperAutoriaItem(scrapy.Item):
         output_processor=l.TakeSecond
     )
     car_number = scrapy.Field(
-        input_processor=MapCompose(l.clean_value)
+        input_processor=MapCompose(l.clean_value),
+        output_processor=TakeFirst()  # TEXT column, not a list
     )
     car_vin = scrapy.Field(
-        input_processor=MapCompose(l.clean_value)
+        input_processor=MapCompose(l.clean_value),
+        output_processor=TakeFirst()
     )
\ No newline at end of file
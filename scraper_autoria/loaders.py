@@ -1,7 +1,14 @@
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Патерни компілюються один раз на модуль, а не на кожен виклик
+NON_DIGITS_RE = re.compile(r'\D')
+NUMBER_RE = re.compile(r'\d+')
+HAS_DIGIT_RE = re.compile(r'\d')
+PHONE_PLACEHOLDERS = frozenset({'Phone not available', 'Phone not found', 'Not available'})
+
 
 def TakeSecond(value):
     """Бере другий елемент зі списку (індекс 1)"""
@@ -46,9 +53,7 @@ def clean_price(value):
     """
     if not value:
         return None
-    s = str(value).replace('$', '').replace('грн', '').strip()
-    import re
-    digits = re.sub(r'[^\d]', '', s)
+    digits = NON_DIGITS_RE.sub('', str(value))
     return int(digits) if digits else None
 
 
@@ -60,10 +65,9 @@ def clean_odometer(value):
     if not value:
         return None
     # Extract the number from the beginning of the string
-    import re
-    numbers = re.findall(r'\d+', str(value))
-    if numbers:
-        return int(numbers[0]) * 1000
+    number = NUMBER_RE.search(str(value))
+    if number:
+        return int(number.group()) * 1000
     return None
 
 
@@ -76,8 +80,7 @@ def clean_image_count(value):
         return None
         # Видаляємо все, крім цифр, щоб VIN-код не заважав, якщо він випадково попаде
         # Але VIN теж містить цифри, тому тут важливо, що TakeSecond візьме саме 2-й елемент
-    import re
-    numbers = re.findall(r'\d+', str(value))
+    numbers = NUMBER_RE.findall(str(value))
 
     if len(numbers) >= 2:
         return int(numbers[1])
@@ -123,8 +126,9 @@ def format_phone_number(phone):
         return None
 
     # Remove all non-digital characters
-    import re
-    digits = re.sub(r'\D', '', str(phone))
+    digits = NON_DIGITS_RE.sub('', str(phone))
+    if not digits:
+        return None  # "Phone not available" тощо — раніше ставало 380
     # If the number starts with 0, replace it with 380.
     if digits.startswith('0'):
         return int('38' + digits)
@@ -151,14 +155,40 @@ def clean_phone_list(value):
         for phone in value:
             if phone and isinstance(phone, str):
                 phone = phone.strip()
-                if phone and phone not in ['Phone not available', 'Phone not found', 'Not available']:
-                    # Checking whether it contains numbers
-                    import re
-                    if re.search(r'\d', phone):
-                        # Format the number after verification
-                        formatted_phone = format_phone_number(phone)
-                        valid_phones.append(formatted_phone)
+                # Checking whether it contains numbers
+                if phone and phone not in PHONE_PLACEHOLDERS and HAS_DIGIT_RE.search(phone):
+                    # Format the number after verification
+                    valid_phones.append(format_phone_number(phone))
 
         return valid_phones
     else:
-        return format_phone_number(value)
\ No newline at end of file
+        return format_phone_number(value)
+
+# ---------------------------------------------------------------------- #
+# Batch-варіанти: весь список сирих значень за один прохід, позиції
+# зберігаються (None там, де значення не розпізнано). Для item processors
+# через Compose(...) і для офлайн-перенормалізації даних з БД.
+# Логіка — в одиночних очищувачах, тут лише цикл з локальним посиланням.
+# ---------------------------------------------------------------------- #
+def clean_prices(values):
+    """[“47 154 $”, “1 966 785 грн”, None] -> [47154, 1966785, None]"""
+    clean = clean_price
+    return [clean(value) for value in values]
+
+
+def clean_odometers(values):
+    """[“95 тис. км”, “—”] -> [95000, None]"""
+    clean = clean_odometer
+    return [clean(value) for value in values]
+
+
+def clean_image_counts(values):
+    """[“1 з 13”, “31”] -> [13, 31]"""
+    clean = clean_image_count
+    return [clean(value) for value in values]
+
+
+def format_phone_numbers(values):
+    """[“(097) 123 45 67”, “Phone not found”] -> [380971234567, None]"""
+    fmt = format_phone_number
+    return [fmt(value) for value in values]
@@ -259,12 +259,32 @@ class ProxyMiddleware:
         if self.proxy_url:
             request.meta['proxy'] = self.proxy_url
 
+class ContextPoolMiddleware:
+    """
+    Контекст з ContextPool павука призначається картці тут, коли запит уже йде в
+    downloader, а не при створенні Request: запити, які відкинув dupefilter
+    чи scheduler, не тримають місце в пулі. Retry того самого запиту зберігає meta
+    і призначений контекст. Стоїть перед PlaywrightContextMiddleware — той фіксує UA
+    за назвою контексту.
+    """
+
+    def process_request(self, request, spider):
+        if request.meta.get('context_pool') and 'playwright_context' not in request.meta:
+            request.meta['playwright_context'] = spider.context_pool.acquire()
+        return None
+
+
 class PlaywrightContextMiddleware:
     """
     Цей middleware бере User-Agent, який згенерував ScrapeOps (або інший middleware),
     і передає його в налаштування браузера Playwright.
+    Для іменованих (перевикористовуваних) контекстів UA фіксується при першому запиті,
+    щоб заголовки не розходились з navigator.userAgent уже створеного контексту.
     """
 
+    def __init__(self):
+        self.context_user_agents = {}
+
     def process_request(self, request, spider):
         # Працюємо тільки якщо це Playwright-запит
         if not request.meta.get('playwright'):
@@ -277,6 +297,11 @@ class PlaywrightContextMiddleware:
             # Декодуємо bytes в str
             ua_str = ua.decode('utf-8')
 
+            context_name = request.meta.get('playwright_context')
+            if context_name and context_name != 'new':
+                ua_str = self.context_user_agents.setdefault(context_name, ua_str)
+                request.headers['User-Agent'] = ua_str
+
             # Ініціалізуємо словник kwargs, якщо його немає
             request.meta.setdefault('playwright_context_kwargs', {})
 
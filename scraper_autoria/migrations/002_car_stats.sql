@@ -0,0 +1,25 @@
+-- Денні лічильники: pipeline інкрементує їх для кожного нового оголошення
+CREATE TABLE IF NOT EXISTS car_stats_daily (
+    day         DATE PRIMARY KEY,
+    found       INTEGER NOT NULL DEFAULT 0,   -- нових оголошень за день
+    with_phone  INTEGER NOT NULL DEFAULT 0    -- з них з телефоном
+);
+
+INSERT INTO car_stats_daily (day, found, with_phone)
+SELECT datetime_found::date,
+       COUNT(*),
+       COUNT(*) FILTER (WHERE cardinality(phone_number) > 0)
+FROM car_products
+WHERE datetime_found IS NOT NULL
+GROUP BY 1
+ON CONFLICT (day) DO NOTHING;
+
+-- Перцентилі ціни/пробігу: перераховуються фоновою задачею API (REFRESH ... CONCURRENTLY)
+CREATE MATERIALIZED VIEW IF NOT EXISTS car_stats_percentiles AS
+SELECT 1 AS id,
+       percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY price_usd) AS price_usd,
+       percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY odometer)  AS odometer,
+       now() AS refreshed_at
+FROM car_products;
+
+CREATE UNIQUE INDEX IF NOT EXISTS car_stats_percentiles_id_idx ON car_stats_percentiles (id);
@@ -0,0 +1,18 @@
+-- Індекси для /cars/search
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+-- car_number/car_vin раніше зберігались як текст масиву ("{WVWZZZ...}", "{""AX 4782 HI""}")
+UPDATE car_products SET car_vin = btrim(car_vin, '{}"') WHERE car_vin LIKE '{%';
+UPDATE car_products SET car_number = btrim(car_number, '{}"') WHERE car_number LIKE '{%';
+UPDATE car_products SET car_vin = NULL WHERE car_vin = '';
+UPDATE car_products SET car_number = NULL WHERE car_number = '';
+
+CREATE INDEX IF NOT EXISTS car_products_price_usd_idx ON car_products (price_usd);
+CREATE INDEX IF NOT EXISTS car_products_odometer_idx ON car_products (odometer);
+CREATE INDEX IF NOT EXISTS car_products_datetime_found_idx ON car_products (datetime_found);
+CREATE INDEX IF NOT EXISTS car_products_title_trgm_idx ON car_products USING gin (title public.gin_trgm_ops);
+
+-- Частковий, але не UNIQUE: одне авто може мати кілька оголошень (перевиставлення),
+-- а UNIQUE зламав би batch-upsert pipeline на такому дублікаті
+CREATE INDEX IF NOT EXISTS car_products_car_vin_idx ON car_products (car_vin) WHERE car_vin IS NOT NULL;
+CREATE INDEX IF NOT EXISTS car_products_car_number_idx ON car_products ((upper(replace(car_number, ' ', ''))));
@@ -0,0 +1,55 @@
+-- Телефони і фото — в окремих таблицях замість BIGINT[]/TEXT[] у кожному рядку:
+-- повторний скрапінг більше не переписує масиви (і весь рядок) заради незмінених даних.
+
+-- ID оголошення з url (`..._39412345.html`) — ціле число замість розбору рядка
+ALTER TABLE car_products ADD COLUMN IF NOT EXISTS listing_id BIGINT;
+UPDATE car_products SET listing_id = substring(url FROM '_(\d+)\.html')::bigint WHERE listing_id IS NULL;
+-- Не UNIQUE: те саме оголошення може жити під двома url (змінився slug назви)
+CREATE INDEX IF NOT EXISTS car_products_listing_id_idx ON car_products (listing_id);
+
+CREATE TABLE IF NOT EXISTS car_images (
+    car_id      INTEGER  NOT NULL REFERENCES car_products (id) ON DELETE CASCADE,
+    position    SMALLINT NOT NULL,          -- порядок фото в оголошенні, з 1
+    url         TEXT     NOT NULL,
+    PRIMARY KEY (car_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS car_phones (
+    car_id      INTEGER NOT NULL REFERENCES car_products (id) ON DELETE CASCADE,
+    phone       BIGINT  NOT NULL,           -- 38063......
+    PRIMARY KEY (car_id, phone)
+);
+
+INSERT INTO car_images (car_id, position, url)
+SELECT p.id, t.position, t.url
+FROM car_products p, unnest(p.image_url) WITH ORDINALITY AS t(url, position)
+WHERE t.url IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO car_phones (car_id, phone)
+SELECT DISTINCT p.id, t.phone
+FROM car_products p, unnest(p.phone_number) AS t(phone)
+WHERE t.phone IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+-- Місце старих масивів звільниться після VACUUM FULL car_products (вручну, у вікно обслуговування)
+ALTER TABLE car_products DROP COLUMN IF EXISTS phone_number, DROP COLUMN IF EXISTS image_url;
+
+-- Попередній вигляд рядка для API: масиви збираються з дочірніх таблиць лише для колонок,
+-- які справді вибрано (невикористані підзапити планувальник відкидає)
+CREATE OR REPLACE VIEW car_listings AS
+SELECT p.id,
+       p.listing_id,
+       p.url,
+       p.title,
+       p.price_usd,
+       p.odometer,
+       p.username,
+       ARRAY(SELECT ph.phone FROM car_phones ph WHERE ph.car_id = p.id ORDER BY ph.phone) AS phone_number,
+       ARRAY(SELECT i.url FROM car_images i WHERE i.car_id = p.id ORDER BY i.position)   AS image_url,
+       p.image_count,
+       p.car_number,
+       p.car_vin,
+       p.datetime_found,
+       p.datetime_updated
+FROM car_products p;
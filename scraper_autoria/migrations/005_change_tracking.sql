@@ -0,0 +1,55 @@
+-- Детекція змін при повторному скрапінгу:
+-- content_hash — blake2b нормалізованих полів оголошення (рахує pipeline),
+-- last_seen — коли оголошення востаннє бачили на сайті, навіть якщо воно не змінилось.
+ALTER TABLE car_products ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+ALTER TABLE car_products ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP;
+UPDATE car_products SET last_seen = GREATEST(datetime_found, datetime_updated) WHERE last_seen IS NULL;
+
+-- Вільне місце на сторінці — щоб дотик last_seen (неіндексована колонка) був HOT-оновленням
+-- без запису в індекси. Діє для нових сторінок; старі — після VACUUM FULL.
+ALTER TABLE car_products SET (fillfactor = 90);
+
+-- Історія ціни/пробігу: рядок на кожну зміну, пише тригер — незалежно від того, хто оновлює таблицю
+CREATE TABLE IF NOT EXISTS price_history (
+    id              BIGSERIAL PRIMARY KEY,
+    car_id          INTEGER   NOT NULL REFERENCES car_products (id) ON DELETE CASCADE,
+    old_price_usd   INTEGER,
+    price_usd       INTEGER,
+    old_odometer    INTEGER,
+    odometer        INTEGER,
+    changed_at      TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS price_history_car_id_idx ON price_history (car_id, changed_at);
+
+CREATE OR REPLACE FUNCTION record_price_change() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO price_history (car_id, old_price_usd, price_usd, old_odometer, odometer, changed_at)
+    VALUES (NEW.id, OLD.price_usd, NEW.price_usd, OLD.odometer, NEW.odometer, NEW.datetime_updated);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS car_products_price_history ON car_products;
+CREATE TRIGGER car_products_price_history
+    AFTER UPDATE OF price_usd, odometer ON car_products
+    FOR EACH ROW
+    WHEN (OLD.price_usd IS DISTINCT FROM NEW.price_usd OR OLD.odometer IS DISTINCT FROM NEW.odometer)
+    EXECUTE FUNCTION record_price_change();
+
+CREATE OR REPLACE VIEW car_listings AS
+SELECT p.id,
+       p.listing_id,
+       p.url,
+       p.title,
+       p.price_usd,
+       p.odometer,
+       p.username,
+       ARRAY(SELECT ph.phone FROM car_phones ph WHERE ph.car_id = p.id ORDER BY ph.phone) AS phone_number,
+       ARRAY(SELECT i.url FROM car_images i WHERE i.car_id = p.id ORDER BY i.position)   AS image_url,
+       p.image_count,
+       p.car_number,
+       p.car_vin,
+       p.datetime_found,
+       p.datetime_updated,
+       p.last_seen
+FROM car_products p;
@@ -0,0 +1,25 @@
+-- Повторна перевірка старих оголошень (scraper_autoria/recheck.py):
+-- removed_at — коли перевірка виявила, що оголошення знято з сайту (404/410 або сторінка без оголошення).
+ALTER TABLE car_products ADD COLUMN IF NOT EXISTS removed_at TIMESTAMP;
+
+-- Індексу на last_seen свідомо немає: вибірка кандидатів однаково читає більшість рядків
+-- і сортує за обчисленим пріоритетом, а індекс зробив би дотик last_seen не-HOT оновленням.
+
+CREATE OR REPLACE VIEW car_listings AS
+SELECT p.id,
+       p.listing_id,
+       p.url,
+       p.title,
+       p.price_usd,
+       p.odometer,
+       p.username,
+       ARRAY(SELECT ph.phone FROM car_phones ph WHERE ph.car_id = p.id ORDER BY ph.phone) AS phone_number,
+       ARRAY(SELECT i.url FROM car_images i WHERE i.car_id = p.id ORDER BY i.position)   AS image_url,
+       p.image_count,
+       p.car_number,
+       p.car_vin,
+       p.datetime_found,
+       p.datetime_updated,
+       p.last_seen,
+       p.removed_at
+FROM car_products p;
@@ -0,0 +1,48 @@
+"""
+Версіоновані SQL-міграції схеми.
+Файли NNN_name.sql застосовуються по порядку, один раз; застосовані версії
+записуються в schema_migrations. Працює з будь-яким DB-API з'єднанням
+(psycopg2 у pipeline, psycopg 3 в API).
+"""
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent
+# pg_advisory_xact_lock: воркери і API можуть стартувати одночасно
+MIGRATIONS_LOCK_ID = 7_301_2026
+
+
+def migration_files():
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9]_*.sql"))
+
+
+def apply_migrations(conn):
+    """Застосовує відсутні міграції в одній транзакції; повертає список нових версій."""
+    applied_now = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version     TEXT PRIMARY KEY,
+                    applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            cur.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cur.fetchall()}
+            for path in migration_files():
+                if path.stem in applied:
+                    continue
+                logger.info(f"Applying migration {path.name}")
+                cur.execute(path.read_text(encoding="utf-8"))
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (path.stem,))
+                applied_now.append(path.stem)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied_now
@@ -1,11 +1,23 @@
 import os
+import json
+import hashlib
 import logging
+import time
+from collections import Counter
 from datetime import datetime
 
 import psycopg2
+import redis
 from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from itemadapter import ItemAdapter
 from scrapy.exceptions import DropItem
+from twisted.internet import defer, task, threads
+from twisted.python.threadpool import ThreadPool
+
+from .bloom import listing_id
+from .migrations import apply_migrations
+from .telemetry import send_stage
 
 
 class PostgreSQLPipeline:
@@ -13,19 +25,69 @@ class PostgreSQLPipeline:
     Зберігає Item-и у таблицю cars.
     • бере параметри підключення із змінної `DATABASE_URL`
       (автоматично проксіюється docker-compose’ом).
-    • INSERT нових оголошень.
-    • UPDATE, якщо оголошення з таким url уже є.
-    • fallback-створення таблиці, якщо init.sql не спрацював.
+    • буферизує Item-и в пам'яті і скидає їх одним
+      `INSERT ... ON CONFLICT (url) DO UPDATE` (POSTGRES_BATCH_SIZE / POSTGRES_FLUSH_INTERVAL).
+    • POSTGRES_BATCH_SIZE = 1 — коміт після кожного Item-а (старий режим).
+    • після коміту додає url-и в Redis-множину scraped_urls (write-through).
+    • в тій самій транзакції інкрементує денну статистику car_stats_daily.
+    • телефони і фото пише в car_phones/car_images; незмінені рядки (і батьківські,
+      і дочірні) не перезаписуються взагалі.
+    • зміну оголошення визначає content_hash нормалізованих полів: незмінене лише
+      отримує last_seen (раз на день), зміни ціни/пробігу тригер пише в price_history.
+    • схему створюють/оновлюють міграції (scraper_autoria/migrations), якщо init.sql не спрацював.
     """
 
     TABLE_NAME = "car_products"
 
+    # Порядок колонок у batch-INSERT (url — ключ конфлікту)
+    COLUMNS = (
+        "url",
+        "listing_id",
+        "title",
+        "price_usd",
+        "odometer",
+        "username",
+        "image_count",
+        "car_number",
+        "car_vin",
+        "datetime_found",
+        "datetime_updated",
+        "last_seen",
+        "content_hash",
+    )
+    # Ці колонки не перезаписуються при повторному скрапінгу
+    KEEP_ON_CONFLICT = ("url", "datetime_found")
+    # Поля Item-а, що йдуть у дочірні таблиці; в рядку буфера вони після COLUMNS
+    ROW_FIELDS = COLUMNS + ("phone_number", "image_url")
+    # Що входить у content_hash. Телефонів тут немає: їх витягування часто збоїть,
+    # і порожній результат не повинен виглядати як зміна оголошення
+    HASHED_FIELDS = ("title", "price_usd", "odometer", "username", "image_count",
+                     "car_number", "car_vin", "image_url")
+
     def __init__(self, database_url: str, crawler=None):
-        self.database_url = os.getenv("DATABASE_URL")
+        self.database_url = database_url or os.getenv("DATABASE_URL")
         self.conn = None
-        self.cur = None
         self.crawler = crawler
         self.spider = crawler.spider if crawler else None  # Store spider reference
+        self.stats = crawler.stats if crawler else None
+
+        settings = crawler.settings if crawler else {}
+        self.batch_size = max(1, int(settings.get("POSTGRES_BATCH_SIZE", 50)))
+        self.flush_interval = float(settings.get("POSTGRES_FLUSH_INTERVAL", 10))
+        # url -> tuple значень у порядку ROW_FIELDS; dict прибирає дублікати в межах батчу
+        # (ON CONFLICT не може оновити один рядок двічі в одній команді)
+        self.buffer = {}
+        self._flush_loop = None
+
+        self.redis_host = settings.get("REDIS_HOST", "localhost")
+        self.redis_port = int(settings.get("REDIS_PORT", 6379))
+        self.scraped_urls_key = settings.get("REDIS_SCRAPED_URLS_KEY", "scraped_urls")
+        # Картки з чекпойнту краулу (AutoriaSpider) вважаються обробленими, коли вони в БД
+        self.pending_key = None
+        if settings.get("CRAWL_CHECKPOINT_ENABLED") and not settings.get("SCRAPY_DISTRIBUTED"):
+            self.pending_key = f"{settings.get('CRAWL_CHECKPOINT_KEY', 'autoria:checkpoint')}:pending"
+        self.redis = None
+
     # --------------------------------------------------------------------- #
     # Scrapy hooks
     # --------------------------------------------------------------------- #
@@ -37,12 +99,20 @@ class PostgreSQLPipeline:
     def open_spider(self,spider):
         # No need to check for spider parameter since we store it in __init__
         self.conn = psycopg2.connect(self.database_url)
-        self.cur = self.conn.cursor()
-        self._ensure_table(self.spider)
+        self._ensure_table(self.conn, self.spider)
+        self._open_redis()
+
+        # Періодичний flush, щоб Item-и не чекали заповнення батчу на повільному краулі
+        if self.batch_size > 1 and self.flush_interval > 0:
+            self._flush_loop = task.LoopingCall(self._flush_buffer)
+            self._flush_loop.start(self.flush_interval, now=False)
 
     def close_spider(self,spider):  # Keep for interface compatibility
+        if self._flush_loop and self._flush_loop.running:
+            self._flush_loop.stop()
         if self.conn:
-            self.cur.close()
+            # Буфер скидається завжди, навіть якщо краул зупинили
+            self._flush_buffer()
             self.conn.close()
 
     # --------------------------------------------------------------------- #
@@ -54,140 +124,404 @@ class PostgreSQLPipeline:
 
         if not url:
             raise DropItem("Missing url")
-        try:
-            # 1. Чи існує оголошення?
-            self.cur.execute(f"SELECT id FROM {self.TABLE_NAME} WHERE url = %s", (url,))
-            row = self.cur.fetchone()
-
-            if row:
-                self._update_item(ad, row[0])
-                # Додайте ID в лог, щоб бачити, що оновлюється саме старий запис
-                self.spider.logger.info(f"📝 Updated [ID:{row[0]}]: {url}")
-            else:
-                self._insert_item(ad)
-                self.spider.logger.info(f"✅ Inserted [NEW]: {url}")
-
-            self.conn.commit()
-            return item
-        except psycopg2.Error as e:
-            self.conn.rollback()  # ← ВАЖЛИВО!
-            self.spider.logger.error(f"Database error: {e}")
-            raise DropItem(f"Database error: {e}")
 
-        except Exception as e:
-            self.conn.rollback()  # ← ВАЖЛИВО!
-            self.spider.logger.error(f"General error: {e}")
-            raise DropItem(f"Error: {e}")
+        self.buffer[url] = self._row_values(ad)
+        if len(self.buffer) >= self.batch_size:
+            self._flush_buffer()
+        return item
+
+    def _flush_buffer(self):
+        """Скидає буфер у БД однією командою і одним комітом."""
+        rows = self._take_buffer()
+        if not rows:
+            return
+        self._flush_done(self._write_batch(self.conn, rows), rows)
+
+    def _take_buffer(self):
+        # Сортування за url — стабільний порядок блокувань для паралельних батчів
+        rows = [self.buffer[url] for url in sorted(self.buffer)]
+        self.buffer.clear()
+        return rows
+
+    def _flush_done(self, result, rows):
+        counts, lost = result
+        if lost:
+            for url, error in lost:
+                self.spider.logger.error(f"Database error, item dropped {url}: {error}")
+            self._inc_stat("postgres/flush_errors")
+            self._inc_stat("postgres/items_lost", len(lost))
+        if self.crawler:
+            send_stage(self.crawler, "db_write", counts["write_seconds"])
+        self._inc_stat("postgres/flushes")
+        for key in ("inserted", "updated", "unchanged", "touched", "child_rows_written"):
+            self._inc_stat(f"postgres/{key}", counts[key])
+        self.spider.logger.info(
+            f"💾 Flushed {len(rows) - len(lost)} items: ✅ {counts['inserted']} inserted, 📝 {counts['updated']} updated, "
+            f"💤 {counts['unchanged']} unchanged ({counts['touched']} touched), "
+            f"🖼️ {counts['child_rows_written']} phone/image rows written"
+        )
+
+    def _flush_failed(self, error, rows):
+        self.spider.logger.error(f"Database error while flushing {len(rows)} items: {error}")
+        self._inc_stat("postgres/flush_errors")
+        self._inc_stat("postgres/items_lost", len(rows))
 
     # ------------------------------------------------------------------ #
     # SQL helpers
     # ------------------------------------------------------------------ #
-    def _insert_item(self, ad):
-        cols = (
-            "url",
-            "title",
-            "price_usd",
-            "odometer",
-            "username",
-            "phone_number",
-            "image_url",
-            "image_count",
-            "car_number",
-            "car_vin",
-            "datetime_found",
-        )
-        values = (
+    def _row_values(self, ad):
+        now = datetime.now()
+        return (
             ad.get("url"),
+            listing_id(ad.get("url")),
             ad.get("title"),
             ad.get("price_usd"),
             ad.get("odometer"),
             ad.get("username"),
-            # self._norm_phone(ad.get("phone_number")),
-            ad.get("phone_number"),
-            ad.get("image_url"),
             ad.get("image_count"),
             ad.get("car_number"),
             ad.get("car_vin"),
-            datetime.now(),
+            now,
+            now,
+            now,
+            self._content_hash(ad),
+            ad.get("phone_number"),
+            [image for image in ad.get("image_url") or () if image],
+        )
+
+    def _content_hash(self, ad):
+        """blake2b-128 від полів HASHED_FIELDS (порядок фіксований, None == відсутнє поле)."""
+        payload = json.dumps([ad.get(field) for field in self.HASHED_FIELDS],
+                             ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def _write_batch(self, conn, rows):
+        """
+        Записує батч; якщо він не пройшов, ділить його навпіл, поки не залишаться лише
+        рядки, які не пишуться, — через один битий рядок не губиться весь батч.
+        Повертає (counts, lost): lost — [(url, помилка)] для незаписаних рядків.
+        """
+        try:
+            return self._write_rows(conn, rows), []
+        except Exception as e:
+            if len(rows) == 1 or conn.closed:
+                # З'єднання розірване — повтори по половинах нічого не дадуть
+                return Counter(), [(row[0], e) for row in rows]
+        middle = len(rows) // 2
+        counts, lost = self._write_batch(conn, rows[:middle])
+        tail_counts, tail_lost = self._write_batch(conn, rows[middle:])
+        counts.update(tail_counts)
+        return counts, lost + tail_lost
+
+    def _write_rows(self, conn, rows):
+        """
+        Записує батч через `conn`.
+        Повертає Counter: inserted, updated, unchanged, touched (last_seen), child_rows_written.
+        """
+        counts = Counter()
+        started = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                written = self._upsert_rows(cur, rows)
+                inserted_urls = {url for url, is_new in written if is_new}
+                changed_urls = {url for url, _ in written}
+                counts["child_rows_written"] = self._sync_children(cur, rows, changed_urls)
+                counts["touched"] = self._touch_last_seen(cur, [row for row in rows if row[0] not in changed_urls])
+                self._bump_daily_stats(cur, [row for row in rows if row[0] in inserted_urls])
+            conn.commit()
+        except Exception:
+            # Будь-яка помилка, не лише psycopg2: інакше транзакція лишається відкритою
+            if not conn.closed:
+                conn.rollback()  # ← ВАЖЛИВО!
+            raise
+        self._remember_urls([row[0] for row in rows])
+        counts["inserted"] = len(inserted_urls)
+        counts["updated"] = len(changed_urls) - len(inserted_urls)
+        counts["unchanged"] = len(rows) - len(changed_urls)
+        counts["write_seconds"] = time.perf_counter() - started  # сигнал шле потік реактора (_flush_done)
+        return counts
+
+    def _touch_last_seen(self, cur, rows):
+        """
+        Незмінені оголошення: лише last_seen, і не частіше разу на день.
+        Колонка не індексована, тож це HOT-оновлення без запису в індекси.
+        """
+        if not rows:
+            return 0
+        seen_at = self.ROW_FIELDS.index("last_seen")
+        now = max(row[seen_at] for row in rows)
+        cur.execute(
+            f"""
+            UPDATE {self.TABLE_NAME} SET last_seen = %s
+            WHERE url = ANY(%s) AND (last_seen IS NULL OR last_seen < date_trunc('day', %s::timestamp))
+            """,
+            (now, [row[0] for row in rows], now),
         )
-        placeholders = ", ".join(["%s"] * len(cols))
-        self.cur.execute(
-            f"INSERT INTO {self.TABLE_NAME} ({', '.join(cols)}) VALUES ({placeholders})",
-            values,
+        return cur.rowcount
+
+    def _bump_daily_stats(self, cur, new_rows):
+        """Лічильники /stats оновлюються інкрементально, без COUNT(*) по всій таблиці."""
+        if not new_rows:
+            return
+        found_at, phone_at = self.ROW_FIELDS.index("datetime_found"), self.ROW_FIELDS.index("phone_number")
+        found, with_phone = Counter(), Counter()
+        for row in new_rows:
+            day = row[found_at].date()
+            found[day] += 1
+            if row[phone_at]:
+                with_phone[day] += 1
+        execute_values(
+            cur,
+            """
+            INSERT INTO car_stats_daily (day, found, with_phone) VALUES %s
+            ON CONFLICT (day) DO UPDATE
+            SET found      = car_stats_daily.found + EXCLUDED.found,
+                with_phone = car_stats_daily.with_phone + EXCLUDED.with_phone
+            """,
+            [(day, count, with_phone[day]) for day, count in found.items()],
         )
 
-    def _update_item(self, ad, item_id):
-        self.cur.execute(
+    def _remember_urls(self, urls):
+        """
+        Write-through у Redis: збережені url-и одразу стають видимими для дедуплікації
+        і виходять з pending-множини чекпойнту.
+        """
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.sadd(self.scraped_urls_key, *urls)
+            if self.pending_key:
+                pipe.srem(self.pending_key, *urls)
+            pipe.execute()
+        except redis.RedisError as e:
+            # Не критично: наступна інкрементальна синхронізація дочитає ці url-и з БД
+            self.spider.logger.warning(f"Redis write-through failed: {e}")
+
+    def _upsert_rows(self, cur, rows):
+        """
+        INSERT ... ON CONFLICT (url) DO UPDATE для всього батчу.
+        Рядок оновлюється лише тоді, коли змінився content_hash, тож RETURNING
+        повертає тільки вставлені й змінені: (url, inserted), `xmax = 0` — щойно вставлені.
+        """
+        updates = ",\n                ".join(
+            f"{col} = EXCLUDED.{col}" for col in self.COLUMNS if col not in self.KEEP_ON_CONFLICT
+        )
+        return execute_values(
+            cur,
             f"""
-            UPDATE {self.TABLE_NAME}
-            SET title          = %s,
-                price_usd      = %s,
-                odometer       = %s,
-                username       = %s,
-                phone_number   = %s,
-                image_url      = %s,
-                image_count    = %s,
-                car_number     = %s,
-                car_vin        = %s,
-                datetime_updated     = %s
-            WHERE id = %s
+            INSERT INTO {self.TABLE_NAME} ({', '.join(self.COLUMNS)})
+            VALUES %s
+            ON CONFLICT (url) DO UPDATE
+            SET {updates}
+            WHERE {self.TABLE_NAME}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING url, (xmax = 0) AS inserted
             """,
-            (
-                ad.get("title"),
-                ad.get("price_usd"),
-                ad.get("odometer"),
-                ad.get("username"),
-                ad.get("phone_number"),
-                ad.get("image_url"),
-                ad.get("image_count"),
-                ad.get("car_number"),
-                ad.get("car_vin"),
-                datetime.now(),
-                item_id,
-            ),
+            [row[:len(self.COLUMNS)] for row in rows],
+            page_size=self.batch_size,
+            fetch=True,
         )
 
+    def _sync_children(self, cur, rows, changed_urls):
+        """
+        Приводить car_phones/car_images у відповідність до батчу, торкаючись лише
+        доданих, змінених і зниклих рядків. Повертає кількість записаних рядків.
+        Фото входять у content_hash, тож їх перевіряємо лише для `changed_urls`.
+        """
+        phones_at, images_at = self.ROW_FIELDS.index("phone_number"), self.ROW_FIELDS.index("image_url")
+        # Порожній список фото — як і з телефонами, найчастіше збій витягування:
+        # такі оголошення зберігають відомі фото, а не видаляють усі
+        changed = [row for row in rows if row[0] in changed_urls and row[images_at]]
+        images = [(row[0], position, image)
+                  for row in changed for position, image in enumerate(row[images_at], start=1)]
+        # Порожній список телефонів — найчастіше збій витягування, а не зникнення номера:
+        # такі оголошення зберігають відомі телефони
+        phones = {row[0]: sorted(set(row[phones_at])) for row in rows if row[phones_at]}
+        written = 0
+
+        # Фото з позицій, яких у новому списку вже немає
+        if changed:
+            execute_values(
+                cur,
+                """
+                DELETE FROM car_images i
+                USING car_products p, (VALUES %s) AS n(url, image_count)
+                WHERE p.url = n.url AND i.car_id = p.id AND i.position > n.image_count
+                """,
+                [(row[0], len(row[images_at])) for row in changed],
+                page_size=len(changed),
+            )
+            written += cur.rowcount
+        if images:
+            execute_values(
+                cur,
+                """
+                INSERT INTO car_images (car_id, position, url)
+                SELECT p.id, n.position, n.image_url
+                FROM (VALUES %s) AS n(url, position, image_url)
+                JOIN car_products p ON p.url = n.url
+                ON CONFLICT (car_id, position) DO UPDATE
+                SET url = EXCLUDED.url
+                WHERE car_images.url IS DISTINCT FROM EXCLUDED.url
+                """,
+                images,
+                template="(%s, %s::smallint, %s)",
+                page_size=len(images),
+            )
+            written += cur.rowcount
+
+        if phones:
+            execute_values(
+                cur,
+                """
+                DELETE FROM car_phones ph
+                USING car_products p, (VALUES %s) AS n(url, phones)
+                WHERE p.url = n.url AND ph.car_id = p.id AND ph.phone <> ALL (n.phones)
+                """,
+                list(phones.items()),
+                template="(%s, %s::bigint[])",
+                page_size=len(phones),
+            )
+            written += cur.rowcount
+            pairs = [(url, phone) for url, numbers in phones.items() for phone in numbers]
+            execute_values(
+                cur,
+                """
+                INSERT INTO car_phones (car_id, phone)
+                SELECT p.id, n.phone
+                FROM (VALUES %s) AS n(url, phone)
+                JOIN car_products p ON p.url = n.url
+                ON CONFLICT DO NOTHING
+                """,
+                pairs,
+                template="(%s, %s::bigint)",
+                page_size=len(pairs),
+            )
+            written += cur.rowcount
+        return written
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def _set_stat(self, key, value):
+        if self.stats:
+            self.stats.set_value(key, value)
+
     # ------------------------------------------------------------------ #
     # Utility
     # ------------------------------------------------------------------ #
-    def _ensure_table(self, spider):
+    def _open_redis(self):
+        try:
+            self.redis = redis.Redis(host=self.redis_host, port=self.redis_port, db=0,
+                                     decode_responses=True, socket_connect_timeout=5)
+            self.redis.ping()
+        except redis.RedisError as e:
+            self.spider.logger.warning(f"Redis unavailable, write-through disabled: {e}")
+            self.redis = None
+
+    def _ensure_table(self, conn, spider):
         """
         Таблиця має з’явитись із init.sql.
-        Якщо ні — створюємо мінімальну схему (fallback),
+        Якщо ні (або схема застаріла) — застосовуємо міграції,
         щоби скрапінг не впав.
         """
-        self.cur.execute(
-            """
-            SELECT EXISTS (
-              SELECT FROM information_schema.tables
-              WHERE  table_name = %s
-            )
-            """,
-            (self.TABLE_NAME,),
-        )
-        exists = self.cur.fetchone()[0]
-        if exists:
-            spider.logger.info("✅ Table cars існує (init.sql відпрацював)")
-            return
+        applied = apply_migrations(conn)
+        if applied:
+            spider.logger.warning(f"⚠️  Applied migrations: {', '.join(applied)}")
+        else:
+            spider.logger.info("✅ Table cars існує, схема актуальна")
 
-        spider.logger.warning("⚠️  Table cars не знайдено – створюю fallback-схему")
-        self.cur.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
-              id              SERIAL PRIMARY KEY,
-              url             TEXT UNIQUE NOT NULL,
-              title           TEXT,
-              price_usd       INTEGER,
-              odometer        INTEGER,
-              username        TEXT,
-              phone_number    BIGINT[],
-              image_url       TEXT[],
-              image_count     INTEGER,
-              car_number      TEXT,
-              car_vin         TEXT,
-              datetime_found  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-              datetime_updated      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """
+
+class AsyncPostgreSQLPipeline(PostgreSQLPipeline):
+    """
+    Неблокуючий варіант PostgreSQLPipeline.
+    • psycopg2-запити виконуються у власному ThreadPool, а не в потоці реактора,
+      тож Playwright-сторінки не зупиняються на час запису.
+    • кожен потік бере з'єднання з ThreadedConnectionPool (POSTGRES_POOL_SIZE).
+    • process_item повертає Deferred лише тоді, коли його Item заповнив батч —
+      це природний backpressure через CONCURRENT_ITEMS.
+    """
+
+    def __init__(self, database_url: str, crawler=None):
+        super().__init__(database_url, crawler)
+        settings = crawler.settings if crawler else {}
+        self.pool_size = max(1, int(settings.get("POSTGRES_POOL_SIZE", 4)))
+        self.db_pool = None
+        self.thread_pool = None
+        self._pending = set()
+
+    def open_spider(self, spider):
+        self.db_pool = ThreadedConnectionPool(1, self.pool_size, self.database_url)
+        self.thread_pool = ThreadPool(minthreads=1, maxthreads=self.pool_size, name="postgres-writer")
+        self.thread_pool.start()
+
+        # Перевірка схеми — один раз до старту краулу, тож блокування тут допустиме
+        conn = self.db_pool.getconn()
+        try:
+            self._ensure_table(conn, self.spider)
+        finally:
+            self.db_pool.putconn(conn)
+        self._open_redis()
+
+        if self.flush_interval > 0:
+            self._flush_loop = task.LoopingCall(self._flush_buffer)
+            self._flush_loop.start(self.flush_interval, now=False)
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        if self._flush_loop and self._flush_loop.running:
+            self._flush_loop.stop()
+        if self.db_pool:
+            self._flush_buffer()
+            # Чекаємо всі батчі, що ще пишуться у фоні
+            yield defer.DeferredList(list(self._pending))
+            self.db_pool.closeall()
+        if self.thread_pool:
+            self.thread_pool.stop()
+
+    def process_item(self, item, spider):
+        ad = ItemAdapter(item)
+        url = ad.get("url")
+
+        if not url:
+            raise DropItem("Missing url")
+
+        self.buffer[url] = self._row_values(ad)
+        if len(self.buffer) >= self.batch_size:
+            d = self._flush_buffer()
+            d.addCallback(lambda _: item)
+            return d
+        return item
+
+    def _flush_buffer(self):
+        """Віддає буфер потоку-записувачу; результат обробляється в потоці реактора."""
+        from twisted.internet import reactor  # імпорт тут — реактор встановлює Scrapy
+
+        rows = self._take_buffer()
+        if not rows:
+            return defer.succeed(None)
+
+        d = threads.deferToThreadPool(reactor, self.thread_pool, self._write_pooled, rows)
+        # errback — лише для збоїв поза записом (напр. вичерпаний пул з'єднань)
+        d.addCallbacks(
+            self._flush_done,
+            lambda failure: self._flush_failed(failure.value, rows),
+            callbackArgs=(rows,),
         )
-        self.conn.commit()
\ No newline at end of file
+        self._pending.add(d)
+        self._set_stat("pipeline/pending_flushes", len(self._pending))
+        d.addBoth(self._forget_pending, d)
+        return d
+
+    def _write_pooled(self, rows):
+        conn = self.db_pool.getconn()
+        try:
+            return self._write_batch(conn, rows)
+        finally:
+            self.db_pool.putconn(conn)
+
+    def _forget_pending(self, result, d):
+        self._pending.discard(d)
+        self._set_stat("pipeline/pending_flushes", len(self._pending))
+        return result
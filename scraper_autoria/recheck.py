@@ -0,0 +1,84 @@
+"""
+Повторна перевірка вже зібраних оголошень.
+URL із scraped_urls павук більше не відвідує, тож зміни ціни і зняті оголошення
+інакше не видно. Раз на день (задача APScheduler у scheduler.py / API.start_scheduler)
+queue_rechecks() обирає з car_products до RECHECK_DAILY_BUDGET активних оголошень, яких
+не бачили щонайменше RECHECK_MIN_AGE_DAYS, і кладе їх у Redis ZSET з пріоритетом
+
+    дні від last_seen × (1 + RECHECK_VOLATILITY_WEIGHT × змін ціни/пробігу за 90 днів)
+
+AutoriaSpider добирає чергу порціями через ZPOPMAX, коли нових карток не лишилось,
+а URL-и знятих оголошень складає в REMOVED_KEY — наступний queue_rechecks()
+проставляє їм removed_at.
+"""
+import os
+
+QUEUE_KEY = "autoria:recheck"
+REMOVED_KEY = "autoria:recheck:removed"
+
+RECHECK_DAILY_BUDGET = int(os.getenv("RECHECK_DAILY_BUDGET", 2000))
+RECHECK_MIN_AGE_DAYS = int(os.getenv("RECHECK_MIN_AGE_DAYS", 7))
+RECHECK_VOLATILITY_WEIGHT = float(os.getenv("RECHECK_VOLATILITY_WEIGHT", 1))
+RECHECK_VOLATILITY_DAYS = 90
+
+# last_seen, а не datetime_updated: pipeline торкається його і тоді, коли оголошення не змінилось
+CANDIDATES_SQL = """
+SELECT p.url,
+       EXTRACT(EPOCH FROM LOCALTIMESTAMP - p.last_seen) / 86400
+           * (1 + %(weight)s * COALESCE(h.changes, 0)) AS priority
+FROM car_products p
+LEFT JOIN (
+    SELECT car_id, count(*) AS changes
+    FROM price_history
+    WHERE changed_at > LOCALTIMESTAMP - make_interval(days => %(volatility_days)s::int)
+    GROUP BY car_id
+) h ON h.car_id = p.id
+WHERE p.removed_at IS NULL
+  AND p.last_seen < LOCALTIMESTAMP - make_interval(days => %(min_age_days)s::int)
+ORDER BY priority DESC
+LIMIT %(budget)s
+"""
+
+
+def mark_removed(conn, r):
+    """removed_at для оголошень, які павук під час перевірки не знайшов; повертає їх кількість."""
+    urls = list(r.smembers(REMOVED_KEY))
+    if not urls:
+        return 0
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE car_products SET removed_at = LOCALTIMESTAMP WHERE url = ANY(%s) AND removed_at IS NULL",
+            (urls,),
+        )
+        marked = cur.rowcount
+    conn.commit()
+    # Лише після коміту: якщо БД впала, URL-и дочекаються наступного запуску
+    r.srem(REMOVED_KEY, *urls)
+    return marked
+
+
+def queue_rechecks(conn, r, budget=RECHECK_DAILY_BUDGET, min_age_days=RECHECK_MIN_AGE_DAYS,
+                   weight=RECHECK_VOLATILITY_WEIGHT):
+    """
+    Денна черга перевірки: до `budget` URL-ів з пріоритетом давності й волатильності.
+    Вчорашній залишок замінюється — він усе одно потрапить у нову вибірку, якщо ще актуальний.
+    Повертає (поставлено в чергу, позначено знятими).
+    """
+    removed = mark_removed(conn, r)
+    with conn.cursor() as cur:
+        cur.execute(CANDIDATES_SQL, {
+            "weight": weight,
+            "volatility_days": RECHECK_VOLATILITY_DAYS,
+            "min_age_days": min_age_days,
+            "budget": budget,
+        })
+        rows = cur.fetchall()
+    conn.commit()
+
+    pipe = r.pipeline()
+    pipe.delete(QUEUE_KEY)
+    if rows:
+        pipe.zadd(QUEUE_KEY, {url: float(priority) for url, priority in rows})
+        pipe.expire(QUEUE_KEY, 2 * 86400)
+    pipe.execute()
+    return len(rows), removed
@@ -0,0 +1,30 @@
+"""
+Серіалізатор запитів для спільної Redis-черги (SCHEDULER_SERIALIZER у scrapy-redis).
+scrapy-playwright кладе в request.meta живі об'єкти браузера, які не можна
+зберегти поза процесом — вони відкидаються, і інший воркер відкриє сторінку заново
+у контексті зі свого пулу.
+"""
+import pickle
+
+TRANSIENT_META_KEYS = (
+    'playwright_page',
+    # Назва контексту з ContextPool воркера, що поставив запит; інший воркер
+    # призначить свій (ContextPoolMiddleware)
+    'playwright_context',
+    'download_slot',
+    'download_latency',
+)
+
+
+def strip_transient_meta(meta):
+    return {key: value for key, value in meta.items() if key not in TRANSIENT_META_KEYS}
+
+
+def dumps(obj):
+    if isinstance(obj, dict) and obj.get('meta'):
+        obj = dict(obj, meta=strip_transient_meta(obj['meta']))
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(s):
+    return pickle.loads(s)
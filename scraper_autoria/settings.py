@@ -1,4 +1,5 @@
 import os
+from datetime import date
 from dotenv import load_dotenv
 from scrapy.utils.request import RequestFingerprinter
 import sys
@@ -13,6 +14,53 @@ BOT_NAME = "scraper_autoria"
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Redis: множина вже зібраних URL для дедуплікації
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+REDIS_SCRAPED_URLS_KEY = "scraped_urls"
+REDIS_SYNC_CHUNK_SIZE = 10000   # рядків на один SADD під час синхронізації з PostgreSQL
+
+# In-process Bloom-фільтр оголошень: Redis лише підтверджує позитиви,
+# а без Redis дедуплікація продовжує працювати тільки на фільтрі
+DEDUP_BLOOM_CAPACITY = 2_000_000  # ~3.6 MB пам'яті при 0.1% хибно-позитивних
+DEDUP_BLOOM_ERROR_RATE = 0.001
+DEDUP_BLOOM_SNAPSHOT = os.path.join('.scrapy', 'scraped_urls.bloom')
+
+# Розподілений режим: N воркерів беруть запити зі спільної Redis-черги (scrapy-redis).
+# Перший воркер запуску засіює всі сторінки пошуку як окремі шарди.
+SCRAPY_DISTRIBUTED = os.getenv('SCRAPY_DISTRIBUTED', 'false').lower() == 'true'
+CRAWL_RUN_ID = os.getenv('CRAWL_RUN_ID', date.today().isoformat())  # спільний для воркерів одного запуску
+DISTRIBUTED_IDLE_TIMEOUT = int(os.getenv('DISTRIBUTED_IDLE_TIMEOUT', 120))  # сек. без роботи до закриття
+SHARD_START_URLS = []  # напр. пошук по марках/регіонах; порожньо — start_urls павука
+if SCRAPY_DISTRIBUTED:
+    SCHEDULER = "scrapy_redis.scheduler.Scheduler"
+    DUPEFILTER_CLASS = "scrapy_redis.dupefilter.RFPDupeFilter"
+    SCHEDULER_QUEUE_CLASS = "scrapy_redis.queue.PriorityQueue"
+    SCHEDULER_PERSIST = True  # черга спільна — воркер не чистить її при закритті
+    SCHEDULER_QUEUE_KEY = f"%(spider)s:requests:{CRAWL_RUN_ID}"
+    SCHEDULER_DUPEFILTER_KEY = f"%(spider)s:dupefilter:{CRAWL_RUN_ID}"
+    SCHEDULER_SERIALIZER = "scraper_autoria.serializers"
+    REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+
+# Чекпойнт краулу в Redis (без SCRAPY_DISTRIBUTED — там черга і так персистентна):
+# курсор пагінації і картки, ще не збережені в БД. Після /spider/stop чи рестарту
+# контейнера наступний запуск продовжує з курсора; успішне завершення чекпойнт видаляє.
+CRAWL_CHECKPOINT_ENABLED = True
+CRAWL_CHECKPOINT_KEY = "autoria:checkpoint"  # hash з курсором; "<key>:pending" — множина карток
+CRAWL_CHECKPOINT_TTL = 3 * 86400  # покинутий чекпойнт не переживе кількох днів
+CRAWL_RESUME = os.getenv('CRAWL_RESUME', 'true').lower() == 'true'  # false — почати з першої сторінки
+
+# Інкрементальний режим: пошук відсортований від нових, тож після K сторінок поспіль
+# без жодного нового оголошення пагінація зупиняється (0 — завжди повний прохід).
+# Повний прохід на вимогу: CRAWL_FULL_SWEEP=true або /spider/run?full_sweep=true
+INCREMENTAL_STOP_PAGES = int(os.getenv('INCREMENTAL_STOP_PAGES', 3))
+CRAWL_FULL_SWEEP = os.getenv('CRAWL_FULL_SWEEP', 'false').lower() == 'true'
+
+# Повторна перевірка старих оголошень (scraper_autoria/recheck.py): денну чергу в Redis
+# наповнює задача scheduler.queue_rechecks, павук добирає її порціями, коли нових карток немає
+RECHECK_ENABLED = os.getenv('RECHECK_ENABLED', 'true').lower() == 'true'
+RECHECK_BATCH_SIZE = 32  # URL-ів за один ZPOPMAX
+
 SPIDER_MODULES = ["scraper_autoria.spiders"]
 NEWSPIDER_MODULE = "scraper_autoria.spiders"
 
@@ -62,6 +110,16 @@ SCRAPEOPS_FAKE_USER_AGENT_ENABLED = True
 SCRAPEOPS_NUM_RESULTS = 10
 PLAYWRIGHT_MAX_CONTEXTS = 8
 PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = 8
+# Контекст для карток авто перевикористовується для N оголошень, потім створюється новий
+PLAYWRIGHT_CONTEXT_MAX_USES = 20
+# Сторінки пошуку через Playwright (False — звичайний HTTP, браузер тільки для карток авто)
+LISTING_PAGES_PLAYWRIGHT = False
+# Телефон: "xhr" — з JSON-відповіді кнопки (і прямим запитом до вивченого endpoint-а), "dom" — з popup-у
+PHONE_EXTRACTION_MODE = "xhr"
+PHONE_API_URL_PATTERN = r"/phones?/"  # regex url-а відповіді з номером
+# Картка авто: "js" — поля збирає один page.evaluate у браузері (без передачі HTML),
+# "fast" — page.content() + скомпільовані XPath (extraction.py), "loader" — ItemLoader
+CAR_EXTRACTION_MODE = "fast"
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = False
 
@@ -92,18 +150,53 @@ DOWNLOADER_MIDDLEWARES = {
     'scraper_autoria.middlewares.ScrapeOpsFakeUserAgentMiddleware': 370,
     'scraper_autoria.middlewares.ScrapeOpsFakeBrowserHeaderAgentMiddleware': 380,
     # 3. ВАЖЛИВО: Наш новий middleware має йти ПІСЛЯ ScrapeOps, але ДО хендлера
+    # (контекст з пулу — перед ним, бо UA фіксується за назвою контексту)
+    'scraper_autoria.middlewares.ContextPoolMiddleware': 390,
     'scraper_autoria.middlewares.PlaywrightContextMiddleware': 400
 }
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
-    "scraper_autoria.pipelines.PostgreSQLPipeline": 300
+    # AsyncPostgreSQLPipeline пише у фоновому ThreadPool; PostgreSQLPipeline — синхронний варіант
+    "scraper_autoria.pipelines.AsyncPostgreSQLPipeline": 300
 }
+# Буферизований запис у PostgreSQL: один INSERT ... ON CONFLICT на батч
+POSTGRES_BATCH_SIZE = 50        # 1 = коміт після кожного Item-а
+POSTGRES_FLUSH_INTERVAL = 10    # секунди; скидає неповний батч на повільному краулі
+POSTGRES_POOL_SIZE = 4          # потоки-записувачі та з'єднання AsyncPostgreSQLPipeline
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+# Вимкнено: delay/concurrency слотів керує AdaptiveThrottle (обидва писали б slot.delay)
+AUTOTHROTTLE_ENABLED = False
+
+EXTENSIONS = {
+    "scraper_autoria.extensions.AdaptiveThrottle": 500,
+    "scraper_autoria.extensions.PrometheusMetrics": 510,
+    "scraper_autoria.extensions.QueuedLogFile": 520,
+}
+# Адаптивний throttle: рендер Playwright, успішність телефонів, частка 403/429
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.5
+ADAPTIVE_THROTTLE_MAX_DELAY = 60
+ADAPTIVE_THROTTLE_DELAY_STEP = 1
+ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 8      # стеля concurrency на слот
+ADAPTIVE_THROTTLE_WINDOW = 20              # відповідей слота на одне рішення
+ADAPTIVE_THROTTLE_BAN_CODES = [403, 429]   # з RETRY_HTTP_CODES — ознаки блокування
+ADAPTIVE_THROTTLE_TARGET_BAN_RATE = 0.05
+ADAPTIVE_THROTTLE_TARGET_PHONE_RATE = 0.7
+ADAPTIVE_THROTTLE_TARGET_LATENCY = 15      # секунд на рендер картки
+# Prometheus-метрики краулу (потрібен prometheus-client): http://<host>:9410/metrics
+PROMETHEUS_ENABLED = True
+PROMETHEUS_ADDR = "0.0.0.0"
+PROMETHEUS_PORT = int(os.getenv('PROMETHEUS_PORT', 9410))
+# Які Scrapy stats віддавати як лічильники autoria_stat_total{stat=...}
+PROMETHEUS_STATS_PREFIXES = [
+    "dedup/", "phone/", "postgres/", "listing/", "distributed/",
+    "retry/", "downloader/response_status_count/", "downloader/exception_type_count/",
+    "item_scraped_count", "item_dropped_count", "response_received_count",
+]
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
@@ -118,6 +211,11 @@ PLAYWRIGHT_ABORT_REQUEST = lambda req: (
 )
 # Рівень логування для Scrapy
 LOG_LEVEL = 'INFO'
+# LOG_FILE пишеться через чергу з ротацією за розміром (extensions.QueuedLogFile);
+# LOG_JSON=true — один JSON-об'єкт на рядок, по одному запису на картку з таймінгами етапів
+LOG_JSON = os.getenv('LOG_JSON', 'false').lower() == 'true'
+LOG_MAX_BYTES = 100 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
 
 # Вимикаємо/фільтруємо шумні логи бібліотек
 import logging
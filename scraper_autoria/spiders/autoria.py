@@ -4,9 +4,20 @@ from playwright.async_api import Page, expect
 from scrapy.crawler import Crawler
 from scrapy.loader import ItemLoader
 from ..items import ScraperAutoriaItem
-import scrapy, os, re, redis, psycopg2
+from ..bloom import BloomFilter, listing_key
+from ..extraction import FIELD_CSS, evaluate_listing, extract_listing
+from ..contexts import ContextPool
+from ..recheck import QUEUE_KEY as RECHECK_QUEUE_KEY, REMOVED_KEY as RECHECK_REMOVED_KEY
+from ..telemetry import send_stage, timed
+from collections import defaultdict, deque
+from datetime import datetime
+import asyncio, scrapy, os, re, time, redis, psycopg2
+import redis.asyncio as aioredis
 from scrapy.selector import Selector
 from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from itemadapter import ItemAdapter
+from w3lib.url import add_or_replace_parameter
 from twisted.internet.error import DNSLookupError, TCPTimedOutError
 from scrapy.spidermiddlewares.httperror import HttpError
 
@@ -16,199 +27,843 @@ class AutoriaSpider(scrapy.Spider):
     start_urls = ["https://auto.ria.com/uk/car/used/"] # Беру стартову сторінку
                   # "https://auto.ria.com/uk/search/?indexName=auto"]
 
+    PHONE_BTN_SELECTOR = "button.size-large.conversion[data-action='showBottomPopUp']"
+    PHONE_TEXT_SELECTOR = "div.popup-inner button.size-large.conversion span"
+    # (097) 123 45 67, 0971234567, +380 97 123 45 67 ...
+    PHONE_VALUE_RE = re.compile(r'\+?[\d\s()\-]{9,20}')
+    SEED_CLAIM_TTL = 300  # сек. на засів запуску, після яких заявку може перехопити інший воркер
+    NEXT_PAGE_SELECTOR = 'a.js-next.page-link::attr(href), a.page-link.js-next::attr(href)'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.loop = None
         self.redis_available = True  # Assume Redis is available by default
+        self.bloom = None
+        self.bloom_ready = False  # True після snapshot-у або успішної синхронізації з БД
+        self.sync_watermark = None
+        self.phone_api_template = None  # напр. ".../users/phones/{id}?..." — вивчається з першого XHR
+        self.phone_api_failures = 0
+        self._idle_since = None
+        self._pages_without_new = defaultdict(int)  # ланцюжок пагінації -> сторінок поспіль без нових
         try:
             self.r = redis.Redis(host=os.getenv('REDIS_HOST', "localhost"), port=6379, db=0, decode_responses=True, socket_connect_timeout=5)
         except Exception as e:
             self.r = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True, socket_connect_timeout=5)
+        # Async-клієнт для перевірок у parse: не блокує потік реактора (AsyncioSelectorReactor)
+        self.ar = aioredis.Redis(host=os.getenv('REDIS_HOST', "localhost"), port=6379, db=0, decode_responses=True, socket_connect_timeout=5)
     @classmethod
     def from_crawler(cls, crawler: Crawler, *args: Any, **kwargs: Any) -> Self:
         spider = super(AutoriaSpider, cls).from_crawler(crawler,*args,**kwargs)
+        spider.scraped_urls_key = crawler.settings.get('REDIS_SCRAPED_URLS_KEY', 'scraped_urls')
+        spider.sync_chunk_size = crawler.settings.getint('REDIS_SYNC_CHUNK_SIZE', 10000)
+        spider.bloom_capacity = crawler.settings.getint('DEDUP_BLOOM_CAPACITY', 2_000_000)
+        spider.bloom_error_rate = crawler.settings.getfloat('DEDUP_BLOOM_ERROR_RATE', 0.001)
+        spider.bloom_snapshot = crawler.settings.get('DEDUP_BLOOM_SNAPSHOT')
+        spider.listing_playwright = crawler.settings.getbool('LISTING_PAGES_PLAYWRIGHT', False)
+        spider.phone_mode = crawler.settings.get('PHONE_EXTRACTION_MODE', 'xhr')
+        spider.extraction_mode = crawler.settings.get('CAR_EXTRACTION_MODE', 'fast')
+        # Один контекст лишається вільним: "default" для сторінок пошуку і місце для ротації пулу
+        spider.context_pool = ContextPool(
+            size=crawler.settings.getint('PLAYWRIGHT_MAX_CONTEXTS', 8) - 1,
+            max_uses=crawler.settings.getint('PLAYWRIGHT_CONTEXT_MAX_USES', 20),
+        )
+        # 403/429 на сторінці пошуку після всіх retry — повтор через Playwright (listing_errback)
+        spider.ban_codes = {int(code) for code in crawler.settings.getlist('ADAPTIVE_THROTTLE_BAN_CODES', [403, 429])}
+        spider.phone_api_re = re.compile(crawler.settings.get('PHONE_API_URL_PATTERN', r'/phones?/'))
+        # Розподілений режим: спільна Redis-черга (scrapy-redis) і шардинг сторінок пошуку
+        spider.distributed = crawler.settings.getbool('SCRAPY_DISTRIBUTED')
+        spider.run_id = crawler.settings.get('CRAWL_RUN_ID')
+        spider.idle_timeout = crawler.settings.getint('DISTRIBUTED_IDLE_TIMEOUT', 120)
+        spider.shard_start_urls = crawler.settings.getlist('SHARD_START_URLS') or spider.start_urls
+        # Чекпойнт: курсор пагінації + картки, ще не збережені в БД (у розподіленому режиму не потрібен)
+        spider.checkpoint_enabled = crawler.settings.getbool('CRAWL_CHECKPOINT_ENABLED') and not spider.distributed
+        spider.checkpoint_key = crawler.settings.get('CRAWL_CHECKPOINT_KEY', f'{cls.name}:checkpoint')
+        spider.pending_key = f"{spider.checkpoint_key}:pending"
+        spider.checkpoint_ttl = crawler.settings.getint('CRAWL_CHECKPOINT_TTL', 3 * 86400)
+        spider.resume = crawler.settings.getbool('CRAWL_RESUME', True)
+        spider.full_sweep = crawler.settings.getbool('CRAWL_FULL_SWEEP')
+        spider.stop_pages = 0 if spider.full_sweep else crawler.settings.getint('INCREMENTAL_STOP_PAGES', 3)
+        # Повторна перевірка старих оголошень з черги recheck.QUEUE_KEY, коли нових карток немає
+        spider.recheck_enabled = crawler.settings.getbool('RECHECK_ENABLED')
+        spider.recheck_batch_size = crawler.settings.getint('RECHECK_BATCH_SIZE', 32)
         crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.request_scheduled, signal=signals.request_scheduled)
         return spider
 
     def spider_opened(self, spider):
+        """
+        Інкрементальна синхронізація Bloom-фільтра і Redis з PostgreSQL.
+        І Redis, і snapshot фільтра зберігають watermark — найбільший
+        datetime_found/datetime_updated, що вже в них потрапив. Один прохід по БД
+        дочитує рядки від найстаршого з двох watermark-ів.
+        Повна синхронізація — лише якщо немає snapshot-у або множини в Redis.
+        """
         self.logger.info("Sync Redis with PostgreSQL...")
+        watermark_key = f"{self.scraped_urls_key}:synced_at"
+        redis_watermark = None
+        try:
+            redis_watermark = self.r.get(watermark_key) if self.r.exists(self.scraped_urls_key) else None
+        except redis.RedisError as e:
+            self.logger.error(f"Failed to connect to Redis {e}")
+            self.redis_available = False
+
+        bloom_watermark = self._load_bloom()
+        watermarks = [bloom_watermark] + ([redis_watermark] if self.redis_available else [])
+        since = None if None in watermarks else min(watermarks, key=datetime.fromisoformat)
+        self.sync_watermark = bloom_watermark
+
+        conn = None
         try:
             conn = psycopg2.connect(os.getenv("DATABASE_URL"))
-            cur = conn.cursor()
-            cur.execute("SELECT url FROM car_products")
-            pipe = self.r.pipeline()
-            for row in cur:
-                pipe.sadd("scraped_urls", row[0])
-            pipe.execute()
-            self.logger.info("Sync completed successfully!!!")
+            # Іменований курсор — server-side: рядки приходять порціями, а не всі в пам'ять
+            cur = conn.cursor(name="redis_sync")
+            cur.itersize = self.sync_chunk_size
+            if since:
+                # >= а не > — рядки з тим самим часом повторно додадуться, SADD ідемпотентний
+                cur.execute(
+                    "SELECT url, GREATEST(datetime_found, datetime_updated) FROM car_products "
+                    "WHERE GREATEST(datetime_found, datetime_updated) >= %s",
+                    (since,),
+                )
+            else:
+                cur.execute("SELECT url, GREATEST(datetime_found, datetime_updated) FROM car_products")
+
+            synced, newest, chunk = 0, None, []
+            for url, changed_at in cur:
+                self.bloom.add(listing_key(url))
+                chunk.append(url)
+                if changed_at and (newest is None or changed_at > newest):
+                    newest = changed_at
+                if len(chunk) >= self.sync_chunk_size:
+                    self._push_to_redis(chunk)
+                    synced += len(chunk)
+                    chunk = []
+            if chunk:
+                self._push_to_redis(chunk)
+                synced += len(chunk)
+            cur.close()
+
+            self.bloom_ready = True
+            if newest is not None:
+                self.sync_watermark = newest.isoformat()
+                if self.redis_available:
+                    self.r.set(watermark_key, self.sync_watermark)
+            mode = f"since {since}" if since else "full"
+            self.logger.info(f"Sync completed successfully!!! ({mode}, {synced} urls, "
+                             f"bloom: {len(self.bloom)} listings)")
         except redis.ConnectionError as e:
             self.logger.error(f"Failed to connect to Redis {e}")
             self.redis_available = False
+        except psycopg2.Error as e:
+            # Redis лишається робочим; фільтр працює, лише якщо є snapshot
+            self.logger.error(f"PostgreSQL unavailable during sync: {e}")
         except Exception as e:
             self.logger.error(f"Error during Redis sync: {e}")
             self.redis_available = False
         finally:
-            try:
-                cur.close()
+            if conn is not None:
                 conn.close()
-            except:
-                pass
+
+    def spider_closed(self, spider, reason):
+        """
+        Зберігає snapshot фільтра, щоб наступний запуск стартував інкрементально.
+        Чекпойнт видаляється лише після повного проходу ("finished"); після
+        /spider/stop ("shutdown") чи таймауту він лишається для наступного запуску.
+        """
+        if self.checkpoint_enabled:
+            try:
+                if reason == 'finished':
+                    self.r.delete(self.checkpoint_key, self.pending_key)
+                else:
+                    self.logger.info(f"⏸️ Crawl stopped ({reason}), checkpoint kept for the next run")
+            except redis.RedisError as e:
+                self.logger.warning(f"Could not update crawl checkpoint: {e}")
+        if not (self.bloom_ready and self.bloom_snapshot):
+            return
+        try:
+            self.bloom.save(self.bloom_snapshot, watermark=self.sync_watermark)
+            self.logger.info(f"Bloom snapshot saved: {len(self.bloom)} listings -> {self.bloom_snapshot}")
+        except OSError as e:
+            self.logger.warning(f"Could not save bloom snapshot: {e}")
+
+    def _load_bloom(self):
+        """Завантажує snapshot фільтра; повертає його watermark (None — потрібен повний прохід)."""
+        if self.bloom_snapshot and os.path.exists(self.bloom_snapshot):
+            try:
+                bloom, header = BloomFilter.load(self.bloom_snapshot)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Ignoring bloom snapshot: {e}")
+            else:
+                if bloom.capacity == self.bloom_capacity and bloom.error_rate == self.bloom_error_rate:
+                    if len(bloom) > bloom.capacity:
+                        self.logger.warning("Bloom filter is over capacity, raise DEDUP_BLOOM_CAPACITY")
+                    self.bloom = bloom
+                    self.bloom_ready = True
+                    return header.get('watermark')
+                self.logger.info("Bloom settings changed, rebuilding filter from PostgreSQL")
+        self.bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        return None
+
+    def _push_to_redis(self, urls):
+        if not self.redis_available:
+            return
+        try:
+            self.r.sadd(self.scraped_urls_key, *urls)
+        except redis.RedisError as e:
+            # Фільтр далі наповнюється з БД, дедуплікація працюватиме без Redis
+            self.logger.error(f"Failed to connect to Redis {e}")
+            self.redis_available = False
 
     async def start(self):
-        for url in self.start_urls:
-            yield scrapy.Request( # запит на сайт
+        if self.distributed and not self._claim_seeding():
+            # Інший воркер уже засіює цей запуск — беремо роботу зі спільної черги
+            self.logger.info(f"🧩 Joined distributed run {self.run_id}, waiting for shared queue")
+            return
+        if self.checkpoint_enabled:
+            resumed = await self._resume_checkpoint()
+            if resumed is not None:
+                for request in resumed:
+                    yield request
+                return
+        for request in self._start_requests():
+            yield request
+        if self.distributed:
+            # Сюди доходимо, коли engine уже забрав (і поставив у чергу) останній стартовий запит
+            self._seeding_done()
+
+    def _start_requests(self):
+        return [
+            scrapy.Request( # запит на сайт
                 url,
                 callback=self.parse,
-                meta={'playwright': True, 'playwright_include_page': True}
+                errback=self.listing_errback,
+                meta={**self._listing_meta(), 'shard_seed': self.distributed},
+                dont_filter=True,
             )
+            for url in (self.shard_start_urls if self.distributed else self.start_urls)
+        ]
+
+    async def _resume_checkpoint(self):
+        """
+        Запити для продовження перерваного запуску: картки з pending-множини, яких ще
+        немає в БД, і пагінація. Перерваний повний прохід продовжується з курсора. В
+        інкрементальному режимі пагінація знову з start_urls (нові оголошення з'являються
+        на перших сторінках), а збережені курсори йдуть окремими ланцюжками зі своїм
+        лічильником early-stop: сторінки, до яких перерваний запуск не дійшов, не
+        губляться через те, що перші з них уже в БД. У чекпойнті лише URL-и — meta
+        (Playwright-контекст з пулу тощо) будується заново, як для нового запиту.
+        None — чекпойнту немає або CRAWL_RESUME = False: новий запуск з start_urls.
+        """
+        try:
+            state = await self.ar.hgetall(self.checkpoint_key) if self.resume else {}
+            if not state:
+                await self._reset_checkpoint()
+                return None
+            pending = await self.ar.smembers(self.pending_key)
+            if state.get('mode') == 'full' and not self.full_sweep:
+                # Перерваний повний прохід продовжується повним, а не зупиняється на старих сторінках
+                self.full_sweep, self.stop_pages = True, 0
+            # Основний ланцюжок (поле cursor) продовжується лише в повному проході поверх
+            # повного; решта курсорів — ланцюжки "cursor:N", перенумеровані для цього запуску
+            main_cursor = state.get('cursor') if state.get('mode') == 'full' else None
+            old_fields = [field for field in state if field == 'cursor' or field.startswith('cursor:')]
+            resumed = list(dict.fromkeys(state[field] for field in old_fields if state[field] != main_cursor))
+            chains = {f'cursor:{n}': url for n, url in enumerate(resumed, 1)}
+            if main_cursor:
+                chains['cursor'] = main_cursor
+            mode = 'full' if self.full_sweep else 'incremental'
+            async with self.ar.pipeline(transaction=True) as pipe:
+                if old_fields:
+                    pipe.hdel(self.checkpoint_key, *old_fields)
+                pipe.hset(self.checkpoint_key, mapping={'mode': mode, **chains})
+                await pipe.execute()
+        except redis.RedisError as e:
+            self.logger.error(f"Redis error while loading checkpoint: {e}. Starting without checkpoint.")
+            self.checkpoint_enabled = False
+            return None
+
+        # Частина карток могла потрапити в БД між останнім записом чекпойнту і зупинкою
+        car_urls = await self._filter_new_urls(sorted(pending))
+        self.crawler.stats.set_value('checkpoint/resumed_car_pages', len(car_urls))
+        self.logger.info(f"⏯️ Resuming crawl started {state.get('started_at')}: {len(car_urls)} pending car pages, "
+                         f"{state.get('pages', 0)} listing pages done, next: {main_cursor or 'first page'}"
+                         + (f", resumed chains: {', '.join(resumed)}" if resumed else ""))
+        requests = [self._car_page_request(url) for url in car_urls]
+        if not main_cursor:
+            requests.extend(self._start_requests())
+        requests.extend(
+            scrapy.Request(url, callback=self.parse, errback=self.listing_errback,
+                           meta={**self._listing_meta(), 'chain': chain}, dont_filter=True)
+            for chain, url in chains.items()
+        )
+        return requests
+
+    async def _reset_checkpoint(self):
+        async with self.ar.pipeline(transaction=True) as pipe:
+            pipe.delete(self.checkpoint_key, self.pending_key)
+            pipe.hset(self.checkpoint_key, mapping={
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'mode': 'full' if self.full_sweep else 'incremental',
+            })
+            pipe.expire(self.checkpoint_key, self.checkpoint_ttl)
+            await pipe.execute()
+
+    async def _save_checkpoint(self, car_urls, next_page, chain='cursor'):
+        """
+        Після кожної сторінки пошуку: її нові картки в pending і курсор ланцюжка
+        на наступну — одним MULTI. Курсор прибирається, коли ланцюжок закінчився.
+        """
+        if not self.checkpoint_enabled:
+            return
+        try:
+            async with self.ar.pipeline(transaction=True) as pipe:
+                if car_urls:
+                    pipe.sadd(self.pending_key, *car_urls)
+                    pipe.expire(self.pending_key, self.checkpoint_ttl)
+                if next_page:
+                    pipe.hset(self.checkpoint_key, chain, next_page)
+                else:
+                    pipe.hdel(self.checkpoint_key, chain)  # остання сторінка ланцюжка пройдена
+                pipe.hincrby(self.checkpoint_key, 'pages', 1)
+                pipe.expire(self.checkpoint_key, self.checkpoint_ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            self.logger.error(f"Redis error while saving checkpoint: {e}. Checkpointing disabled.")
+            self.checkpoint_enabled = False
+
+    async def _drop_pending(self, url):
+        """Картка, що впала, не повертається при відновленні (збережені прибирає pipeline)."""
+        if not self.checkpoint_enabled:
+            return
+        try:
+            await self.ar.srem(self.pending_key, url)
+        except redis.RedisError as e:
+            self.logger.warning(f"Could not update crawl checkpoint: {e}")
+
+    def _claim_seeding(self, on_error=True):
+        """
+        Тільки один воркер на запуск засіює стартові сторінки.
+        Заявка (SET NX) живе SEED_CLAIM_TTL секунд: якщо воркер впаде раніше, ніж стартові
+        запити потраплять у чергу, запуск засіє інший (spider_idle). Після засіву
+        ставиться довгий маркер seeded.
+        """
+        try:
+            if self.r.exists(f"{self.name}:seeded:{self.run_id}"):
+                return False
+            return bool(self.r.set(f"{self.name}:seeding:{self.run_id}", os.getpid(),
+                                   nx=True, ex=self.SEED_CLAIM_TTL))
+        except redis.RedisError as e:
+            self.logger.error(f"Redis error while claiming seeding: {e}.")
+            return on_error  # на старті — засіюємо локально
+
+    def _seeding_done(self):
+        try:
+            pipe = self.r.pipeline()
+            pipe.set(f"{self.name}:seeded:{self.run_id}", os.getpid(), ex=2 * 86400)
+            pipe.delete(f"{self.name}:seeding:{self.run_id}")
+            pipe.execute()
+        except redis.RedisError as e:
+            # Заявка закінчиться, і запуск засіють ще раз: перша сторінка пошуку пройде повторно,
+            # а шарди 2..N відсіє спільний dupefilter
+            self.logger.error(f"Redis error while marking run seeded: {e}")
+
+    def spider_idle(self, spider):
+        """
+        Нові картки закінчились — беремо наступну порцію з черги повторної перевірки.
+        У розподіленому режимі черга може поповнитись іншими воркерами,
+        тому павук чекає DISTRIBUTED_IDLE_TIMEOUT секунд без роботи, перш ніж закритись.
+        """
+        if self.recheck_enabled and self._schedule_rechecks():
+            raise DontCloseSpider
+        if not self.distributed:
+            return
+        if self._claim_seeding(on_error=False):
+            # Воркер, що взяв заявку, впав до засіву — засіюємо запуск замість нього
+            self.logger.info(f"🧩 Run {self.run_id} was not seeded, seeding it now")
+            for request in self._start_requests():
+                self.crawler.engine.crawl(request)
+            self._seeding_done()
+            self._idle_since = None
+            raise DontCloseSpider
+        now = time.monotonic()
+        if self._idle_since is None:
+            self._idle_since = now
+        if now - self._idle_since < self.idle_timeout:
+            raise DontCloseSpider
+
+    def request_scheduled(self, request, spider):
+        """
+        Розподілений режим: картка з уже призначеним контекстом (retry) повертається в
+        спільну чергу і може дістатись іншому воркеру — її місце в пулі цього воркера
+        звільняється тут, поки meta ще не серіалізовано.
+        """
+        if not (self.distributed and request.meta.get('context_pool') and 'playwright_context' in request.meta):
+            return
+        context_name = request.meta.pop('playwright_context')
+        page = request.meta.pop('playwright_page', None)
+        if page is not None:
+            asyncio.ensure_future(self._release_page(page, context_name))
+        else:
+            self.context_pool.release(context_name)
+
+    def _schedule_rechecks(self):
+        """
+        ZPOPMAX порції з черги перевірки (спершу найстаріші й найволатильніші).
+        Черга денна: URL-и, взяті процесом, який потім упав, повернуться в завтрашню вибірку.
+        """
+        try:
+            popped = self.r.zpopmax(RECHECK_QUEUE_KEY, self.recheck_batch_size)
+        except redis.RedisError as e:
+            self.logger.warning(f"Redis error while reading re-check queue: {e}")
+            popped = []
+        if not popped:
+            self.recheck_enabled = False  # черга порожня — не опитуємо Redis на кожному idle
+            return False
+        for url, _ in popped:
+            self.crawler.engine.crawl(self._car_page_request(url, recheck=True))
+        self.crawler.stats.inc_value('recheck/scheduled', len(popped))
+        self.logger.info(f"🔁 {len(popped)} listings scheduled for re-check")
+        return True
+
+    async def _mark_removed(self, url):
+        """Зняте оголошення; removed_at у БД проставить наступний recheck.queue_rechecks()."""
+        self.crawler.stats.inc_value('recheck/removed')
+        try:
+            await self.ar.sadd(RECHECK_REMOVED_KEY, url)
+        except redis.RedisError as e:
+            self.logger.warning(f"Could not record removed listing {url}: {e}")
 
-    def parse(self, response, **kwargs):
-        cars = response.css('section.ticket-item')
-        for car in cars: # прохід по сторінкам оголошень
+    def _listing_meta(self, playwright=None):
+        """
+        Meta для сторінок пошуку. З parse читаються лише CSS-посилання, тож за
+        замовчуванням вони йдуть звичайним HTTP-хендлером Scrapy, а браузер
+        лишається для parse_car_page (LISTING_PAGES_PLAYWRIGHT = True — старий режим).
+        """
+        use_playwright = self.listing_playwright if playwright is None else playwright
+        return {'playwright': True} if use_playwright else {}
+
+    async def parse(self, response, **kwargs):
+        self._idle_since = None
+        started = time.perf_counter()
+        if not response.css('section.ticket-item') and not response.meta.get('playwright'):
+            # HTTP-відповідь без оголошень (JS-заглушка/антибот) — повторюємо цю сторінку браузером
+            self.logger.warning(f"No tickets in HTTP response {response.url}, retrying with Playwright")
+            self.crawler.stats.inc_value('listing/playwright_fallback')
+            yield response.request.replace(meta={**response.request.meta, **self._listing_meta(True)},
+                                           dont_filter=True)
+            return
+
+        # Спершу збираємо всі url-и сторінки, потім одна перевірка в Redis на всю сторінку
+        car_urls = []
+        for car in response.css('section.ticket-item'): # прохід по сторінкам оголошень
             car_url = car.css('a.m-link-ticket::attr(href), a.address::attr(href)').get()
             if car_url and not car_url.strip().startswith(('javascript', '#')):
                 if 'newauto' in car_url.lower():
                     continue
+                car_urls.append(car_url)
+        car_urls = list(dict.fromkeys(car_urls))  # без дублікатів, порядок зберігається
 
+        new_urls = await self._filter_new_urls(car_urls)
+        skipped = len(car_urls) - len(new_urls)
+        self.crawler.stats.inc_value('dedup/new', len(new_urls))
+        self.crawler.stats.inc_value('dedup/skipped', skipped)
+        self.logger.info(f"📄 {response.url}: {len(new_urls)} new, {skipped} skipped (already in DB)")
+        send_stage(self.crawler, 'listing_parse', time.perf_counter() - started)
+
+        new_urls = [response.urljoin(car_url) for car_url in new_urls]
+        next_page = response.css(self.NEXT_PAGE_SELECTOR).get()
+        stop = bool(next_page) and self._incremental_stop(response, new_urls)
+        await self._save_checkpoint(new_urls, None if stop or not next_page else response.urljoin(next_page),
+                                    response.meta.get('chain', 'cursor'))
+
+        for car_url in new_urls:
+            yield self._car_page_request(car_url)
+        if self.distributed and response.meta.get('shard_seed'):
+            # Розподілений режим: всі сторінки пошуку одразу йдуть у спільну чергу (шарди),
+            # а не по одній через кнопку "далі"
+            shard_requests = self._shard_listing_pages(response)
+            if shard_requests:
+                for request in shard_requests:
+                    yield request
+                return
+        elif self.distributed:
+            return  # сторінка-шард: її сусідів уже засіяно
+        if stop:
+            return
 
-                try:
-                    if self.r.sismember("scraped_urls", car_url):
-                        self.logger.info(f"Skipping {car_url}, already in DB")
-                        continue
-                except redis.RedisError as e:
-                    self.logger.error(f"Redis error: {e}. Continuing without URL deduplication.")
-                    self.redis_available = False
-
-                yield response.follow(
-                    car_url,
-                    callback=self.parse_car_page, # запуск методу для збирання даних
-                    meta={
-                        'playwright': True,
-                        'playwright_include_page': True,
-                        'playwright_context': 'new',
-                        'playwright_page_goto_kwargs': {
-                            'wait_until': 'load',  # Changed: Waits for more JS to run
-                            'timeout': 60000,  # Increased: Gives page more time to settle
-                        },
-                    }
-                )
         # Pagination (unchanged)
-        next_page = response.css('a.js-next.page-link::attr(href), a.page-link.js-next::attr(href)').get()
         # page_num = 1
         # next_page = response.url + "&page=" + str(page_num)
         if next_page:
             self.logger.info(f"Moving to next page: {next_page}")
-            yield response.follow(next_page, callback=self.parse, meta={"playwright":True}) # перехід на наступну сторінку через отримання посилання з кнопки
+            yield response.follow(next_page, callback=self.parse, errback=self.listing_errback,
+                                  meta={**self._listing_meta(), 'shard_seed': self.distributed,
+                                        'chain': response.meta.get('chain', 'cursor')}) # перехід на наступну сторінку через отримання посилання з кнопки
         else:
             self.logger.info(f"HTTP STATUS (trying to reach next page): {response.status}")
             self.logger.info(f"HEADERS: {response.headers.to_unicode_dict()}")
             # page_num += 1
 
+    def listing_errback(self, failure):
+        """
+        Сторінка пошуку, заблокована і після всіх retry (403/429), повторюється браузером —
+        як і відповідь без оголошень у parse. Інакше заблокована перша сторінка
+        закінчувала б увесь запуск.
+        """
+        request = failure.request
+        if (failure.check(HttpError) and failure.value.response.status in self.ban_codes
+                and not request.meta.get('playwright')):
+            self.logger.warning(f"HTTP {failure.value.response.status} on {request.url}, retrying with Playwright")
+            self.crawler.stats.inc_value('listing/playwright_fallback')
+            # retry_times скидається: браузерна спроба має власні повтори
+            meta = {key: value for key, value in request.meta.items() if key != 'retry_times'}
+            yield request.replace(meta={**meta, **self._listing_meta(True)}, dont_filter=True)
+            return
+        self.logger.error(f"Listing page failed {request.url}: {failure.value!r}")
+
+    def _incremental_stop(self, response, new_urls):
+        """
+        True — далі не гортаємо: INCREMENTAL_STOP_PAGES сторінок поспіль без нових оголошень.
+        Лічильник окремий для кожного ланцюжка пагінації (meta['chain']).
+        Лише для послідовної пагінації: у розподіленому режимі всі сторінки засіяні шардами.
+        """
+        chain = response.meta.get('chain', 'cursor')
+        self._pages_without_new[chain] = 0 if new_urls else self._pages_without_new[chain] + 1
+        if self.distributed or not self.stop_pages or self._pages_without_new[chain] < self.stop_pages:
+            return False
+        self.logger.info(f"⏹️ {self._pages_without_new[chain]} pages in a row without new listings, "
+                         f"incremental crawl ({chain}) stops at {response.url}")
+        self.crawler.stats.set_value('listing/early_stop_page', response.url)
+        return True
+
+    def _car_page_request(self, url, recheck=False):
+        return scrapy.Request(
+            url,
+            callback=self.parse_car_page, # запуск методу для збирання даних
+            errback=self.car_page_errback,
+            meta={
+                'playwright': True,
+                'playwright_include_page': True,
+                'context_pool': True,  # теплий контекст з пулу — призначає ContextPoolMiddleware
+                'playwright_page_goto_kwargs': {
+                    'wait_until': 'load',  # Changed: Waits for more JS to run
+                    'timeout': 60000,  # Increased: Gives page more time to settle
+                },
+                'recheck': recheck,
+            }
+        )
+
+    def _shard_listing_pages(self, response):
+        """Запити на сторінки 2..N пошуку; N — найбільший номер у пагінації першої сторінки."""
+        page_numbers = [int(n) for n in response.css('a.page-link::text, span.page-link::text').re(r'^\s*(\d+)\s*$')]
+        last_page = max(page_numbers, default=0)
+        if last_page < 2:
+            return []
+        self.logger.info(f"🧩 Sharding {response.url}: pages 2..{last_page} -> shared queue")
+        self.crawler.stats.inc_value('distributed/seeded_pages', last_page - 1)
+        return [
+            scrapy.Request(
+                add_or_replace_parameter(response.url, 'page', str(page_num)),
+                callback=self.parse,
+                errback=self.listing_errback,
+                meta=self._listing_meta(),
+            )
+            for page_num in range(2, last_page + 1)
+        ]
+
+    async def _filter_new_urls(self, urls):
+        """
+        Повертає url-и, яких ще немає в БД.
+        • Bloom-негатив — точно нове оголошення, Redis не питаємо.
+        • Bloom-позитив підтверджується одним SMISMEMBER на всю сторінку.
+        • Без Redis позитиви вважаються дублікатами (помилка ~DEDUP_BLOOM_ERROR_RATE).
+        """
+        if not urls:
+            return urls
+        if self.bloom_ready:
+            maybe_seen = [url for url in urls if listing_key(url) in self.bloom]
+        else:
+            maybe_seen = urls  # фільтр не завантажився — лише Redis, як раніше
+        if not maybe_seen:
+            return urls
+
+        if not self.redis_available:
+            if not self.bloom_ready:
+                return urls
+            seen = set(maybe_seen)
+        else:
+            try:
+                flags = await self.ar.smismember(self.scraped_urls_key, maybe_seen)
+                seen = {url for url, is_member in zip(maybe_seen, flags) if is_member}
+            except redis.RedisError as e:
+                self.logger.error(f"Redis error: {e}. Continuing with bloom filter only.")
+                self.redis_available = False
+                seen = set(maybe_seen) if self.bloom_ready else set()
+        if self.bloom_ready:
+            # Без фільтра maybe_seen — уся сторінка, і нові оголошення не є хибними позитивами
+            self.crawler.stats.inc_value('dedup/bloom_false_positive', len(maybe_seen) - len(seen))
+        return [url for url in urls if url not in seen]
+
     async def parse_car_page(self, response, **kwargs):
+        self._idle_since = None
         page: Page = response.meta.get('playwright_page')
         if not page:
+            self.context_pool.release(response.meta.get('playwright_context'))
             return
 
+        started = time.perf_counter()
+        # Один підсумковий запис на картку (у LOG_JSON — окремі поля): етапи, результат
+        timings = {}
+        outcome = 'error'
         try:
             # Set default timeout (lower slightly for overall speed)
             page.set_default_timeout(20000)
 
-            # Handle cookie banner (using expect)
-            cookie_selector = "button.fc-cta-do-not-consent"
-            cookie_locator = page.locator(cookie_selector)
-            try:
-                await expect(cookie_locator).to_be_visible(timeout=3000)
-                await cookie_locator.click(force=True, timeout=5000)
-                self.logger.info("✅ Cookie banner closed")
-            except AssertionError:
-                self.logger.debug("No cookie banner visible")
-
-            # Explicit wait for phone button section to settle
-            await page.wait_for_selector("div#sellerInfo", state='visible', timeout=10000)
-
-            # Extract phone (calls updated method)
-            phone_number = await self._extract_phone_number(page)
-            if phone_number:
-                self.logger.info(f"✅ Phone extracted: {phone_number}")
+            # Cookie-банер обробляється один раз на контекст — далі відмова зберігається в cookies
+            context_name = response.meta.get('playwright_context')
+            if context_name not in self.context_pool.consented:
+                with timed(self.crawler, 'cookie_banner', timings):
+                    await self._handle_cookie_banner(page)
+                self.context_pool.consented.add(context_name)
+
+            recheck = response.meta.get('recheck')
+            # Перевірка оновлює вже збережений рядок: після редиректу (зміна slug-а) url у
+            # БД лишається той, з яким оголошення знайшли, а не новий — інакше ON CONFLICT (url)
+            # вставив би дублікат, а last_seen старого рядка ніколи б не змінився
+            item_url = response.request.url if recheck else response.url
+            if recheck:
+                # Повторна перевірка: телефон не клікаємо — він не входить у content_hash,
+                # а порожній список у pipeline зберігає вже відомі номери
+                phone_number = None
             else:
-                self.logger.warning("⚠️ Could not extract phone number")
-
-            # Get content and selector (unchanged)
-            content = await page.content()
-            sel = Selector(text=content)
-
-            # Loader (unchanged)
-            loader = ItemLoader(item=ScraperAutoriaItem(), selector=sel)
-            loader.add_value('url', response.url)
-            loader.add_css('title', 'div#basicInfoTitle h1::text, div#sideTitleTitle span::text')
-            loader.add_css('price_usd', 'div#basicInfoPrice strong::text, div#sidePrice strong::text')
-            loader.add_css('odometer', 'div#basicInfoTableMainInfo0 span::text')
-            loader.add_css('username', 'div#sellerInfoUserName span::text')
-            if phone_number:
-                loader.add_value('phone_number', phone_number)
-            loader.add_css('image_url', 'img::attr(data-src)')
-            loader.add_css('image_count', 'span.common-badge.alpha.medium span::text')
-            loader.add_css('car_number', 'div.car-number span::text')
-            loader.add_css('car_vin', 'span#badgesVin span::text')
-
-            yield loader.load_item()
+                # Explicit wait for phone button section to settle
+                with timed(self.crawler, 'seller_wait', timings):
+                    await page.wait_for_selector("div#sellerInfo", state='visible', timeout=10000)
+
+                # Extract phone (calls updated method)
+                with timed(self.crawler, 'phone', timings):
+                    phone_number = await self._extract_phone_number(page)
+
+            if self.extraction_mode == 'js':
+                with timed(self.crawler, 'page_evaluate', timings):
+                    item = await evaluate_listing(page, item_url, phone_number)
+            else:
+                with timed(self.crawler, 'page_content', timings):
+                    content = await page.content()
+                with timed(self.crawler, 'item_loading', timings):
+                    if self.extraction_mode == 'fast':
+                        item = extract_listing(content, item_url, phone_number)
+                    else:
+                        item = self._load_item(content, item_url, phone_number)
+
+            if recheck and not ItemAdapter(item).get('title'):
+                # Сторінка відкрилась, але оголошення на ній немає (редирект на пошук тощо)
+                await self._mark_removed(response.request.url)
+                outcome = 'removed'
+                return
+
+            if self.bloom is not None:
+                self.bloom.add(listing_key(item_url))
+            outcome = 'ok' if phone_number or recheck else 'no_phone'
+            if recheck:
+                self.crawler.stats.inc_value('recheck/refreshed')
+            yield item
 
         except Exception as e:
             self.logger.error(f"Error processing {response.url}: {str(e)}")
             self.logger.info(f"HTTP STATUS (error scrape car page): {response.status}")
             self.logger.info(f"HEADERS: {response.headers.to_unicode_dict()}")
         finally:
-            if not page.is_closed():
-                await page.close()
+            await self._release_page(page, response.meta.get('playwright_context'))
+            if outcome == 'error':
+                await self._drop_pending(response.request.url)
+            seconds = time.perf_counter() - started
+            send_stage(self.crawler, 'car_page', seconds)
+            timings['car_page'] = round(seconds, 3)
+            log = self.logger.info if outcome in ('ok', 'removed') else self.logger.warning
+            log(f"🚗 {outcome} {response.url} in {seconds:.1f}s", extra={
+                'event': 'car_page',
+                'url': response.url,
+                'outcome': outcome,
+                'recheck': bool(response.meta.get('recheck')),
+                'navigation': response.meta.get('download_latency'),
+                'timings': timings,
+            })
 
-    async def _extract_phone_number(self, page: Page) -> str:
-        if page.is_closed():
-            return ""
+    @staticmethod
+    def _load_item(content, url, phone_number):
+        """Повільніший ItemLoader-шлях (CAR_EXTRACTION_MODE = "loader") — еталон для extraction.py."""
+        loader = ItemLoader(item=ScraperAutoriaItem(), selector=Selector(text=content))
+        loader.add_value('url', url)
+        for field, css in FIELD_CSS.items():
+            loader.add_css(field, css)
+        if phone_number:
+            loader.add_value('phone_number', phone_number)
+        return loader.load_item()
 
-        phone_btn_selector = "button.size-large.conversion[data-action='showBottomPopUp']"
-        phone_text_selector = "div.popup-inner button.size-large.conversion span"
+    async def car_page_errback(self, failure):
+        """Сторінка, що впала на завантаженні, теж має повернутись у пул."""
+        request = failure.request
+        self.logger.error(f"Request failed {request.url}: {failure.value!r}")
+        await self._drop_pending(request.url)
+        if (request.meta.get('recheck') and failure.check(HttpError)
+                and failure.value.response.status in (404, 410)):
+            await self._mark_removed(request.url)
+        page = request.meta.get('playwright_page')
+        if page is not None:
+            await self._release_page(page, request.meta.get('playwright_context'))
+        else:
+            self.context_pool.release(request.meta.get('playwright_context'))
+
+    async def _release_page(self, page: Page, context_name):
+        if self.context_pool.release(context_name):
+            # Контекст відслужив max_uses оголошень — закриваємо разом зі сторінками
+            self.logger.debug(f"♻️ Recycling context {context_name}")
+            await page.context.close()
+        elif not page.is_closed():
+            await page.close()
 
+    async def _handle_cookie_banner(self, page: Page):
+        cookie_locator = page.locator("button.fc-cta-do-not-consent")
         try:
-            btn = page.locator(phone_btn_selector).first
-            await expect(btn).to_be_visible(timeout=5000)
-            await expect(btn).to_be_enabled(timeout=3000)
-            await btn.scroll_into_view_if_needed()
+            await expect(cookie_locator).to_be_visible(timeout=3000)
+            await cookie_locator.click(force=True, timeout=5000)
+            self.logger.debug("✅ Cookie banner closed")
+        except AssertionError:
+            self.logger.debug("No cookie banner visible")
 
-            # Click with force and fallback
-            try:
-                await btn.click(force=True, timeout=5000)
-                self.logger.info("✅ Phone button clicked")
-            except Exception as e:
-                self.logger.warning(f"⚠️ Standard click failed: {str(e)} - Trying JS fallback")
-                await page.evaluate(f'document.querySelector("{phone_btn_selector}").click()')
+    async def _extract_phone_number(self, page: Page) -> list[str]:
+        """
+        PHONE_EXTRACTION_MODE = "xhr": номер береться з JSON-відповіді, яку викликає кнопка
+        телефону (або напряму з цього ж endpoint-а, якщо його шаблон уже відомий).
+        PHONE_EXTRACTION_MODE = "dom": клік і читання тексту popup-у.
+        Повертає список сирих номерів (у оголошення їх буває кілька) або [].
+        """
+        if page.is_closed():
+            return []
 
-            # Short delay for JS to initiate load
-            await page.wait_for_timeout(1000)
+        listing_id = listing_key(page.url)
+        phone = []
+        try:
+            if self.phone_mode == 'xhr':
+                phone = await self._replay_phone_api(page, listing_id)
+                if phone:
+                    self.crawler.stats.inc_value('phone/api_replay')
+                    return phone
+                phone = await self._intercept_phone_response(page, listing_id)
+                if phone:
+                    self.crawler.stats.inc_value('phone/xhr')
+                    return phone
+                # Кнопку вже натиснуто — popup міг відмалюватись і без розпізнаної відповіді
+                phone = await self._read_phone_popup(page)
+            else:
+                await self._click_phone_button(page)
+                phone = await self._read_phone_popup(page)
+            if phone:
+                self.crawler.stats.inc_value('phone/dom')
+        except Exception as e:
+            self.logger.warning(f"⚠️ Phone extract error: {str(e)}")
 
-            # Wait for digits with longer timeout
-            try:
-                await page.wait_for_function("""
-                    () => {
-                        const text = document.querySelector('div.popup-inner button.size-large.conversion span')?.innerText || '';
-                        return /\d/.test(text);  // Any digit – less strict
-                    }
-                """, timeout=10000)  # Increased for slow API
-            except Exception as wait_e:
-                self.logger.warning(f"⚠️ Wait timed out: {str(wait_e)} - Attempting fallback extraction")
-
-            # Always try to extract text (fallback if wait failed)
-            phone_elem = page.locator(phone_text_selector).first
-            try:
-                await expect(phone_elem).to_be_visible(timeout=3000)
-                phone_text = await phone_elem.inner_text()
-                if phone_text and re.search(r'\d', phone_text):# Quick check in Python
-                    return phone_text.strip()
-                else:
-                    self.logger.debug("Fallback text found but no digits")
-            except Exception:
-                pass
+        if not phone:
+            self.crawler.stats.inc_value('phone/failed')
+        return phone
 
+    async def _click_phone_button(self, page: Page):
+        btn = page.locator(self.PHONE_BTN_SELECTOR).first
+        await expect(btn).to_be_visible(timeout=5000)
+        await expect(btn).to_be_enabled(timeout=3000)
+        try:
+            await btn.click(force=True, timeout=5000)
+            self.logger.debug("✅ Phone button clicked")
         except Exception as e:
-            self.logger.warning(f"⚠️ Phone extract error: {str(e)}")
+            self.logger.warning(f"⚠️ Standard click failed: {str(e)} - Trying JS fallback")
+            await page.evaluate(f'document.querySelector("{self.PHONE_BTN_SELECTOR}").click()')
 
-        return ""
\ No newline at end of file
+    async def _intercept_phone_response(self, page: Page, listing_id: str) -> list[str]:
+        """Клікає кнопку і чекає її XHR/fetch-відповідь замість опитування DOM."""
+        try:
+            async with page.expect_response(
+                lambda r: self.phone_api_re.search(r.url) is not None, timeout=10000
+            ) as response_info:
+                await self._click_phone_button(page)
+            api_response = await response_info.value
+            payload = await api_response.json()
+        except Exception as e:
+            self.logger.warning(f"⚠️ Phone API response not captured: {str(e)}")
+            return []
+
+        phone = self._phone_from_payload(payload)
+        if phone:
+            self._remember_phone_endpoint(api_response.url, listing_id)
+        return phone
+
+    async def _replay_phone_api(self, page: Page, listing_id: str) -> list[str]:
+        """
+        Повторює вже відомий endpoint телефону напряму через page.request
+        (ті самі cookies і проксі, що й у контексту), без кліку і рендерингу popup-у.
+        """
+        if not self.phone_api_template or not listing_id.isdigit():
+            return []
+        try:
+            api_response = await page.request.get(self.phone_api_template.format(id=listing_id), timeout=5000)
+            if api_response.ok:
+                phone = self._phone_from_payload(await api_response.json())
+                if phone:
+                    self.phone_api_failures = 0
+                    return phone
+        except Exception as e:
+            self.logger.debug(f"Phone API replay failed: {str(e)}")
+
+        self.phone_api_failures += 1
+        if self.phone_api_failures >= 3:
+            # Endpoint, мабуть, підписаний (hash/expires) — повертаємось до перехоплення
+            self.logger.info("Phone API replay disabled after repeated failures")
+            self.phone_api_template = None
+        return []
+
+    def _remember_phone_endpoint(self, api_url: str, listing_id: str):
+        if self.phone_api_template is None and listing_id.isdigit() and listing_id in api_url:
+            self.phone_api_template = api_url.replace('{', '{{').replace('}', '}}').replace(listing_id, '{id}')
+            self.phone_api_failures = 0
+            self.logger.info(f"📞 Phone API endpoint learned: {self.phone_api_template}")
+
+    async def _read_phone_popup(self, page: Page) -> list[str]:
+        # expect() чекає на подію появи цифр у popup-і, без фіксованих sleep
+        phone_elem = page.locator(self.PHONE_TEXT_SELECTOR).first
+        try:
+            await expect(phone_elem).to_have_text(re.compile(r'\d'), timeout=5000)
+            phone_text = await phone_elem.inner_text()
+            return [phone_text.strip()]
+        except Exception:
+            self.logger.debug("Phone popup text has no digits")
+        return []
+
+    @classmethod
+    def _phone_from_payload(cls, payload) -> list[str]:
+        """
+        Шукає номери в JSON-відповіді будь-якої вкладеності — лише під ключами з "phone"
+        у назві (phone, phones[], formattedPhoneNumber; не phoneId). Id оголошення,
+        користувача чи timestamp під іншими ключами теж бувають 9–13 цифр, тож без такого
+        ключа повертається [] і спрацьовує DOM-fallback.
+        Усі номери в порядку документа, без повторів; сирий текст — форматування
+        робить l.clean_phone_list.
+        """
+        phones = []
+        queue = deque([(None, payload)])
+        while queue:
+            key, value = queue.popleft()
+            if isinstance(value, dict):
+                queue.extendleft(reversed(value.items()))
+            elif isinstance(value, list):
+                queue.extendleft((key, v) for v in reversed(value))
+            elif isinstance(value, (str, int)) and not isinstance(value, bool):
+                name = str(key).lower() if key else ''
+                if 'phone' not in name or name.endswith('id'):
+                    continue
+                text = str(value).strip()
+                digits = sum(ch.isdigit() for ch in text)
+                if 9 <= digits <= 13 and cls.PHONE_VALUE_RE.fullmatch(text) and text not in phones:
+                    phones.append(text)
+        return phones
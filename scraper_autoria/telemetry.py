@@ -0,0 +1,53 @@
+"""
+Таймінги етапів краулу.
+Код павука і pipeline обгортає етап у `timed(crawler, "phone")`; після завершення
+надсилається Scrapy-сигнал `stage_finished` (stage, seconds). Сигнал слухає
+extensions.PrometheusMetrics; без підписників це лише порожня розсилка.
+Тут же JsonFormatter — формат рядків лог-файлу при LOG_JSON (див. extensions.QueuedLogFile).
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+stage_finished = object()
+
+
+def send_stage(crawler, stage, seconds):
+    crawler.signals.send_catch_log(stage_finished, stage=stage, seconds=seconds)
+
+
+@contextmanager
+def timed(crawler, stage, timings=None):
+    """Час етапу (і з помилкою теж — він усе одно витрачений); timings — dict для лог-запису."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        if timings is not None:
+            timings[stage] = round(seconds, 3)
+        send_stage(crawler, stage, seconds)
+
+
+# Атрибути, які є в кожному LogRecord; решта — поля з extra={...}
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Один JSON-об'єкт на рядок: ts, level, logger, msg і всі поля з extra."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                # Scrapy додає extra={'spider': spider} — у лог іде лише ім'я
+                entry[key] = getattr(value, "name", value) if key == "spider" else value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)